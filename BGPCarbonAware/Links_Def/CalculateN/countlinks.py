@@ -1,28 +1,131 @@
 import csv
-from collections import Counter
-
-# Counter to track undirected AS links
-link_counter = Counter()
-
-# Input file: filtered prefixes and AS paths
-input_file = '2025-05-01_filtered_prefixes_aspaths.csv'
-output_file = '2025-05-01_as_links_count.csv'
-
-# Read and process AS paths
-with open(input_file, 'r') as f:
-    reader = csv.reader(f, delimiter='|')
-    for row in reader:
-        if len(row) < 2:
-            continue
-        as_path = row[1].strip().split()
-        for i in range(len(as_path) - 1):
-            a, b = as_path[i], as_path[i + 1]
-            link = tuple(sorted((a, b)))  # Undirected: (a, b) == (b, a)
-            link_counter[link] += 1
-
-# Write results to output CSV: as1, as2, count
-with open(output_file, 'w', newline='') as f_out:
-    writer = csv.writer(f_out)
-    writer.writerow(['as1', 'as2', 'count'])  # header
-    for (as1, as2), count in link_counter.items():
-        writer.writerow([as1, as2, count])
+import mmap
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+# The collector's columnar RIB format lives next to bgp_path_collector.py
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..', 'green_routing-AS', 'bgpstream'))
+from rib_columnar import iter_rib_batches, path_arrays
+from path_dictionary import dictionary_file, load_path_dictionary, read_path_ids
+from link_counter import PATH_BATCH, batch_path_strings, parse_paths, count_links_batch, count_link_batches, \
+    count_unique_paths, merge_link_counts, write_link_counts
+
+# Bytes of the paths file parsed together inside a chunk
+BLOCK_SIZE = 64 << 20
+
+
+# Yields the AS path of every row as a string. CSV rows are prefix|as_path.
+def read_as_paths(input_file):
+    with open(input_file, 'r') as f:
+        reader = csv.reader(f, delimiter='|')
+        for row in reader:
+            if len(row) < 2:
+                continue
+            yield row[1].strip()
+
+
+# Yields the AS paths of the input as (hops, offsets) batches. Parquet files are read through
+# the as_path column only (prepending is already removed there, so they never contribute
+# self-links such as (a, a)).
+def read_path_batches(input_file, batch_size=PATH_BATCH):
+    if input_file.endswith('.parquet'):
+        for batch in iter_rib_batches(input_file, columns=['as_path'], batch_size=batch_size):
+            yield path_arrays(batch)
+        return
+    yield from batch_path_strings(read_as_paths(input_file), batch_size)
+
+
+# Counts undirected AS links over all paths of the input
+def count_links(input_file):
+    return count_link_batches(read_path_batches(input_file))
+
+
+# Counts undirected AS links of a prefix|path_id file: every distinct path of its dictionary is
+# walked once and weighted by the number of rows that carry it
+def count_links_interned(input_file):
+    hops, offsets = load_path_dictionary(dictionary_file(input_file))
+    path_ids, first_row, multiplicity = np.unique(read_path_ids(input_file), return_index=True, return_counts=True)
+    n_paths = len(offsets) - 1
+    path_multiplicity = np.zeros(n_paths, dtype=np.int64)
+    path_first_row = np.zeros(n_paths, dtype=np.int64)
+    path_multiplicity[path_ids] = multiplicity
+    path_first_row[path_ids] = first_row
+    return count_unique_paths(hops, offsets, path_multiplicity, path_first_row)
+
+
+# Splits the file into byte ranges of about equal size that start at the beginning of a line
+def chunk_boundaries(input_file, chunks):
+    size = os.path.getsize(input_file)
+    if size == 0:
+        return [0, 0]
+    boundaries = [0]
+    with open(input_file, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for i in range(1, chunks):
+            newline = mm.find(b'\n', max(size * i // chunks, boundaries[-1] + 1) - 1)
+            boundary = size if newline == -1 else newline + 1
+            if boundary >= size:
+                break
+            if boundary > boundaries[-1]:
+                boundaries.append(boundary)
+    boundaries.append(size)
+    return boundaries
+
+
+# Worker entry point: counts the links of the lines in [start, end). Links are numbered by the
+# byte offset of the block they are read from, so the first-seen order stays global across chunks.
+def count_links_range(input_file, start, end, block_size=BLOCK_SIZE):
+    total = count_link_batches([])
+    with open(input_file, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        position = start
+        while position < end:
+            block_end = min(position + block_size, end)
+            if block_end < end:
+                newline = mm.find(b'\n', block_end - 1, end)
+                block_end = end if newline == -1 else newline + 1
+            lines = mm[position:block_end].decode('utf-8').splitlines()
+            as_paths = [row[1].strip() for row in csv.reader(lines, delimiter='|') if len(row) >= 2]
+            hops, offsets, tokens = parse_paths(as_paths)
+            # A line holds fewer hops than bytes, so positions never reach the next block
+            total = merge_link_counts(total, count_links_batch(hops, offsets, position, tokens))
+            position = block_end
+    return total
+
+
+# Merges two partial link counts, one step of the tree reduction
+def merge_pair(pair):
+    return merge_link_counts(*pair)
+
+
+# Counts the links of a prefix|as_path CSV on several processes: the file is memory-mapped and split
+# at newline-aligned byte offsets, every chunk is counted separately and the partial counts are
+# merged pairwise in a tree. The result is identical to count_links().
+def count_links_parallel(input_file, workers=os.cpu_count(), chunks_per_worker=4):
+    boundaries = chunk_boundaries(input_file, workers * chunks_per_worker)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(count_links_range, input_file, start, end)
+                   for start, end in zip(boundaries[:-1], boundaries[1:])]
+        parts = [future.result() for future in futures]
+        while len(parts) > 1:
+            pairs = [(parts[i], parts[i + 1]) for i in range(0, len(parts) - 1, 2)]
+            merged = list(executor.map(merge_pair, pairs))
+            if len(parts) % 2:
+                merged.append(parts[-1])
+            parts = merged
+    return parts[0] if parts else count_link_batches([])
+
+
+if __name__ == "__main__":
+    # Input file: filtered prefixes and AS paths
+    input_file = '2025-05-01_filtered_prefixes_aspaths.csv'
+    output_file = '2025-05-01_as_links_count.csv'
+    # Worker processes; 1 counts the file serially
+    workers = 16
+    if os.path.exists(dictionary_file(input_file)):
+        # prefix|path_id rows with a path dictionary (output_format='interned')
+        write_link_counts(count_links_interned(input_file), output_file)
+    elif workers > 1:
+        write_link_counts(count_links_parallel(input_file, workers), output_file)
+    else:
+        write_link_counts(count_links(input_file), output_file)
@@ -1,15 +1,59 @@
 import csv
+import os
+import sys
 
-input_file = '2025-05-01_ribs.csv'
-output_file = '2025-05-01_prefixes_aspaths.csv'
-
-with open(input_file, 'r') as infile, open(output_file, 'w', newline='') as outfile:
-    reader = csv.reader(infile, delimiter='|')
-    writer = csv.writer(outfile, delimiter='|')
-    
-    for row in reader:
-        if len(row) < 12:
-            continue  # salta righe malformate
-        prefix = row[9]
-        as_path = row[11]
-        writer.writerow([prefix, as_path])
+# The collector's columnar RIB format lives next to bgp_path_collector.py
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..', 'green_routing-AS', 'bgpstream'))
+from rib_columnar import iter_rib_batches, prefix_strings, path_strings
+from path_dictionary import write_interned_rows, dictionary_file
+
+# Rows whose paths are interned together
+INTERN_BATCH = 1 << 16
+
+
+# Yields [prefix, as_path] rows of a prefix|as_path CSV, or of a collector Parquet file
+# (only the prefix and path columns are read)
+def read_prefix_paths(input_file):
+    if input_file.endswith('.parquet'):
+        for batch in iter_rib_batches(input_file, columns=['af', 'prefix_addr', 'prefix_len', 'as_path']):
+            yield from zip(prefix_strings(batch), path_strings(batch))
+        return
+    with open(input_file, 'r') as infile:
+        yield from csv.reader(infile, delimiter='|')
+
+
+# Yields [prefix, as_path] rows of the collector's full pipe-separated rows or Parquet file
+def read_rib_prefix_paths(input_file):
+    if input_file.endswith('.parquet'):
+        yield from read_prefix_paths(input_file)
+        return
+    with open(input_file, 'r') as infile:
+        for row in csv.reader(infile, delimiter='|'):
+            if len(row) < 12:
+                continue  # salta righe malformate
+            yield row[9], row[11]
+
+
+# Projects the collector's rows onto prefix|as_path
+def extract_prefix_paths(input_file, output_file):
+    with open(output_file, 'w', newline='') as outfile:
+        writer = csv.writer(outfile, delimiter='|')
+        writer.writerows(read_rib_prefix_paths(input_file))
+
+
+# Projects the collector's rows onto prefix|path_id and writes each distinct path once to the
+# path dictionary next to the output
+def extract_interned(input_file, output_file):
+    write_interned_rows(read_rib_prefix_paths(input_file), output_file, dictionary_file(output_file),
+                        batch_size=INTERN_BATCH)
+
+
+if __name__ == "__main__":
+    input_file = '2025-05-01_ribs.csv'
+    output_file = '2025-05-01_prefixes_aspaths.csv'
+    # Set to True to write prefix|path_id rows plus a path dictionary instead of the paths
+    interned = False
+    if interned:
+        extract_interned(input_file, output_file)
+    else:
+        extract_prefix_paths(input_file, output_file)
@@ -1,56 +1,66 @@
 import csv
-import ipaddress
+import os
+import shutil
+import sys
+import pyarrow as pa
 
-# Function to load valid prefixes from .pfx2as files
-def load_pfx2as_prefixes(filenames):
-    ipv4_set = set()
-    ipv6_set = set()
-    
-    for filename in filenames:
-        with open(filename, 'r') as f:
-            for line in f:
-                parts = line.strip().split()
-                if len(parts) < 2:
-                    continue
-                ip, length = parts[0], parts[1]
-                try:
-                    net = ipaddress.ip_network(f"{ip}/{length}", strict=False)
-                    if net.version == 4:
-                        ipv4_set.add(str(net))
-                    elif net.version == 6:
-                        ipv6_set.add(str(net))
-                except ValueError:
-                    continue  # skip malformed lines
-    return ipv4_set, ipv6_set
+# The collector's columnar RIB format lives next to bgp_path_collector.py
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..', 'green_routing-AS', 'bgpstream'))
+from rib_columnar import RIB_SCHEMA, iter_rib_batches, open_rib_writer
+from path_dictionary import dictionary_file
+from pfx2as_filter import load_pfx2as_index, match_prefixes, match_batch
 
-# Function to filter rows from the main CSV file
-def filter_csv(input_csv, ipv4_set, ipv6_set, output_csv):
+# Rows whose prefixes are tested together
+FILTER_BATCH = 1 << 18
+
+# Function to keep the rows whose prefix is announced in pfx2as. mode 'exact' keeps only prefixes
+# announced as such, 'covering' also keeps more specifics of an announced prefix.
+def filter_rows(rows, pfx2as_index, mode='exact'):
+    batch = list()
+    for row in rows:
+        if not row:
+            continue
+        batch.append(row)
+        if len(batch) >= FILTER_BATCH:
+            matched = match_prefixes([row[0] for row in batch], pfx2as_index, mode)
+            yield from (row for row, keep in zip(batch, matched.tolist()) if keep)
+            batch = list()
+    if batch:
+        matched = match_prefixes([row[0] for row in batch], pfx2as_index, mode)
+        yield from (row for row, keep in zip(batch, matched.tolist()) if keep)
+
+# Function to filter rows from the main CSV file. prefix|path_id rows keep their ids, so the path
+# dictionary of the input is copied along with them.
+def filter_csv(input_csv, pfx2as_index, output_csv, mode='exact'):
     with open(input_csv, 'r') as infile, open(output_csv, 'w', newline='') as outfile:
         reader = csv.reader(infile, delimiter='|')
         writer = csv.writer(outfile, delimiter='|')
-        
-        for row in reader:
-            if not row:
-                continue
-            prefix = row[0]
-            try:
-                net = ipaddress.ip_network(prefix, strict=False)
-                if net.version == 4 and str(net) in ipv4_set:
-                    writer.writerow(row)
-                elif net.version == 6 and str(net) in ipv6_set:
-                    writer.writerow(row)
-            except ValueError:
-                continue  # skip invalid prefixes
+        writer.writerows(filter_rows(reader, pfx2as_index, mode))
+    if os.path.exists(dictionary_file(input_csv)):
+        shutil.copyfile(dictionary_file(input_csv), dictionary_file(output_csv))
 
-# Input files
-pfx2as_files = [
-    'routeviews-rv2-20250501-1200.pfx2as',  # IPv4
-    'routeviews-rv6-20250501-1200.pfx2as'   # IPv6
-]
-input_csv = '2025-05-01_prefixes_aspaths.csv'
-output_csv = '2025-05-01_filtered_prefixes_aspaths.csv'
+# Function to filter a collector Parquet file; only the given columns are read and written
+def filter_parquet(input_file, pfx2as_index, output_file, mode='exact',
+                   columns=('af', 'prefix_addr', 'prefix_len', 'as_path')):
+    writer = open_rib_writer(output_file, pa.schema([RIB_SCHEMA.field(column) for column in columns]))
+    for batch in iter_rib_batches(input_file, columns=list(columns)):
+        writer.write_batch(batch.filter(pa.array(match_batch(batch, pfx2as_index, mode))))
+    writer.close()
 
-# Execution
+if __name__ == "__main__":
+    # Input files
+    pfx2as_files = [
+        'routeviews-rv2-20250501-1200.pfx2as',  # IPv4
+        'routeviews-rv6-20250501-1200.pfx2as'   # IPv6
+    ]
+    input_csv = '2025-05-01_prefixes_aspaths.csv'
+    output_csv = '2025-05-01_filtered_prefixes_aspaths.csv'
+    # 'exact' or 'covering' (longest-match) filtering
+    mode = 'exact'
 
-ipv4_prefixes, ipv6_prefixes = load_pfx2as_prefixes(pfx2as_files)
-filter_csv(input_csv, ipv4_prefixes, ipv6_prefixes, output_csv)
+    # Execution
+    pfx2as_index = load_pfx2as_index(pfx2as_files)
+    if input_csv.endswith('.parquet'):
+        filter_parquet(input_csv, pfx2as_index, output_csv, mode)
+    else:
+        filter_csv(input_csv, pfx2as_index, output_csv, mode)
@@ -0,0 +1,369 @@
+import json
+import os
+import shutil
+import sys
+import numpy as np
+import pybgpstream
+
+# The collector lives in green_routing-AS/bgpstream
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..', 'green_routing-AS', 'bgpstream'))
+from bgp_path_collector import COLLECTORS_PER_PROJECT, open_stream, remove_prepending, has_cycle
+from bogon_index import load_bogon_index, validate_prefixes
+from path_dictionary import new_path_dictionary, intern_paths, save_path_dictionary, load_path_dictionary, path_strings
+from pfx2as_filter import load_pfx2as_index, match_prefixes
+from link_counter import link_keys, write_link_counts
+
+# Keeps link counts up to date from BGP UPDATE dumps instead of re-reading full RIBs.
+# Prefixes, peers and paths get dense ids (paths through the path dictionary of
+# path_dictionary.py). The routes of a peer are two aligned int32 arrays, its prefix ids (sorted)
+# and their path ids, so only routes that exist take memory; the routes changed since those
+# arrays were last rebuilt wait in a small per-peer dict {prefix id: path id, -1 if withdrawn}.
+# Every path's undirected links, packed as min << 32 | max like link_counter.py, are kept once
+# in a CSR buffer aligned with the path ids.
+# A RIB snapshot seeds the state, then every announcement, withdrawal or peer going down only
+# records the path ids it adds and removes; the link counts (sorted keys and counts) absorb the
+# net change of a whole batch at once. The state is saved as plain numpy files.
+
+# Elements whose prefixes are validated together
+UPDATE_BATCH = 4096
+
+# Changed routes a peer keeps in its dict before its route arrays are rebuilt (at least; up to an
+# eighth of its routes, so rebuilding stays cheap per change)
+PENDING_ROUTES = 1024
+
+
+# An empty state
+def new_state():
+    return {
+        'prefix_ids': dict(), 'prefixes': list(),
+        'peer_ids': dict(), 'peers': list(),
+        # Per peer: (prefix ids, path ids) arrays and the dict of routes changed since
+        'routes': list(), 'pending': list(),
+        'paths': new_path_dictionary(),
+        # CSR of the link keys of every path: the links of path i are link_keys[link_offsets[i]:link_offsets[i + 1]]
+        'link_keys': np.zeros(0, dtype=np.uint64), 'link_offsets': np.zeros(1, dtype=np.int64),
+        'path_count': 0, 'link_key_count': 0,
+        # Path ids added and removed since the link counts were last brought up to date
+        'added': list(), 'removed': list(),
+        'links': (np.zeros(0, dtype=np.uint64), np.zeros(0, dtype=np.int64)),
+    }
+
+
+# Returns the array with at least `size` entries, doubling its capacity when it grows
+def _grow(array, size, fill):
+    capacity = len(array)
+    if size <= capacity:
+        return array
+    grown = np.full(max(size, 2 * capacity, 16), fill, dtype=array.dtype)
+    grown[:capacity] = array
+    return grown
+
+
+# Id of a prefix, registering it when add is set; None for unknown prefixes otherwise
+def prefix_id(state, prefix, add=False):
+    pid = state['prefix_ids'].get(prefix)
+    if pid is None and add:
+        pid = state['prefix_ids'][prefix] = len(state['prefixes'])
+        state['prefixes'].append(prefix)
+    return pid
+
+
+# Id of a peer (collector, peer_asn, peer_address), registering it when add is set
+def peer_id(state, peer, add=False):
+    pid = state['peer_ids'].get(peer)
+    if pid is None and add:
+        pid = state['peer_ids'][peer] = len(state['peers'])
+        state['peers'].append(peer)
+        state['routes'].append((np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int32)))
+        state['pending'].append(dict())
+    return pid
+
+
+# Appends the link keys of the paths interned since the last call to the CSR buffer
+def _add_path_links(state):
+    paths = state['paths']
+    count = len(paths['ids'])
+    if count == state['path_count']:
+        return
+    # intern_paths appends one chunk per call; take the chunks holding the new paths
+    lengths = list()
+    hops = list()
+    seen = count
+    for chunk_hops, chunk_lengths in zip(reversed(paths['chunks']), reversed(paths['lengths'])):
+        if seen == state['path_count']:
+            break
+        hops.append(chunk_hops)
+        lengths.append(chunk_lengths)
+        seen -= len(chunk_lengths)
+    hops = np.concatenate(hops[::-1])
+    lengths = np.concatenate(lengths[::-1])
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    keys, _ = link_keys(hops, offsets)
+
+    first = state['link_key_count']
+    state['link_keys'] = _grow(state['link_keys'], first + len(keys), 0)
+    state['link_keys'][first:first + len(keys)] = keys
+    state['link_key_count'] = first + len(keys)
+    state['link_offsets'] = _grow(state['link_offsets'], count + 1, 0)
+    state['link_offsets'][state['path_count'] + 1:count + 1] = first + np.cumsum(np.maximum(lengths - 1, 0))
+    state['path_count'] = count
+
+
+# Path id of the current route of a peer for a prefix, -1 if there is none
+def _route(state, peer_index, prefix_index):
+    pending = state['pending'][peer_index]
+    if prefix_index in pending:
+        return pending[prefix_index]
+    prefixes, paths = state['routes'][peer_index]
+    i = int(np.searchsorted(prefixes, prefix_index))
+    if i < len(prefixes) and prefixes[i] == prefix_index:
+        return int(paths[i])
+    return -1
+
+
+# Rebuilds the route arrays of a peer with its changed routes
+def _merge_routes(state, peer_index):
+    pending = state['pending'][peer_index]
+    if not pending:
+        return
+    prefixes, paths = state['routes'][peer_index]
+    changed = np.fromiter(pending.keys(), dtype=np.int32, count=len(pending))
+    changed_paths = np.fromiter(pending.values(), dtype=np.int32, count=len(pending))
+    kept = ~np.isin(prefixes, changed)
+    prefixes, paths = prefixes[kept], paths[kept]
+    announced = changed_paths >= 0
+    changed, changed_paths = changed[announced], changed_paths[announced]
+    order = np.argsort(changed)
+    idx = np.searchsorted(prefixes, changed[order])
+    state['routes'][peer_index] = (np.insert(prefixes, idx, changed[order]), np.insert(paths, idx, changed_paths[order]))
+    state['pending'][peer_index] = dict()
+
+
+# Returns the path ids of the given paths, interning the new ones
+def path_ids(state, as_paths):
+    ids = intern_paths(state['paths'], as_paths)
+    _add_path_links(state)
+    return ids
+
+
+# Replaces the route a peer has for a prefix; path None withdraws it
+def update_route(state, peer, prefix, path):
+    if path is None:
+        peer_index, prefix_index = peer_id(state, peer), prefix_id(state, prefix)
+        if peer_index is None or prefix_index is None:
+            return
+    else:
+        peer_index, prefix_index = peer_id(state, peer, add=True), prefix_id(state, prefix, add=True)
+    old_path = _route(state, peer_index, prefix_index)
+    if old_path >= 0:
+        state['removed'].append(old_path)
+    pending = state['pending'][peer_index]
+    if path is None:
+        if old_path >= 0:
+            pending[prefix_index] = -1
+    else:
+        pending[prefix_index] = path
+        state['added'].append(path)
+    if len(pending) > max(PENDING_ROUTES, len(state['routes'][peer_index][0]) >> 3):
+        _merge_routes(state, peer_index)
+
+
+# Withdraws every route of a peer, e.g. when its session goes down
+def withdraw_peer(state, peer):
+    peer_index = peer_id(state, peer)
+    if peer_index is None:
+        return
+    _merge_routes(state, peer_index)
+    state['removed'].extend(state['routes'][peer_index][1].tolist())
+    state['routes'][peer_index] = (np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int32))
+
+
+# Brings the link counts up to date with the routes added and removed since the last call:
+# the net change of every path is expanded to its links through the CSR buffer, then summed per link
+def flush_links(state):
+    if not state['added'] and not state['removed']:
+        return
+    count = state['path_count']
+    net = np.bincount(np.array(state['added'], dtype=np.int64), minlength=count) \
+        - np.bincount(np.array(state['removed'], dtype=np.int64), minlength=count)
+    state['added'], state['removed'] = list(), list()
+    changed = np.flatnonzero(net)
+    if len(changed) == 0:
+        return
+    starts = state['link_offsets'][changed]
+    lengths = state['link_offsets'][changed + 1] - starts
+    total = int(lengths.sum())
+    if total == 0:
+        return
+    # Positions of the links of every changed path in the CSR buffer
+    run_starts = np.cumsum(lengths) - lengths
+    positions = np.arange(total) - np.repeat(run_starts - starts, lengths)
+    keys = state['link_keys'][positions]
+    deltas = np.repeat(net[changed], lengths)
+
+    order = np.argsort(keys, kind='stable')
+    keys, deltas = keys[order], deltas[order]
+    boundaries = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+    keys, deltas = keys[boundaries], np.add.reduceat(deltas, boundaries)
+
+    current_keys, counts = state['links']
+    idx = np.searchsorted(current_keys, keys)
+    known = idx < len(current_keys)
+    known[known] = current_keys[idx[known]] == keys[known]
+    counts = counts.copy()
+    np.add.at(counts, idx[known], deltas[known])
+    current_keys = np.insert(current_keys, idx[~known], keys[~known])
+    counts = np.insert(counts, idx[~known], deltas[~known])
+    # Links no current path uses any more are dropped
+    kept = counts != 0
+    state['links'] = (current_keys[kept], counts[kept])
+
+
+# Same path checks as the collector: no AS sets, no loops, more than one AS after prepending removal
+def is_usable_path(as_path):
+    if '{' in as_path:
+        return False
+    as_path_list = remove_prepending(as_path.split())
+    return not has_cycle(as_path_list) and len(as_path_list) > 1
+
+
+# Applies a batch of elements in stream order; announced prefixes are validated and the usable
+# paths interned as a batch
+def _apply_batch(state, batch, bogon_index, pfx2as_index, mode, checkpoint):
+    announced = [i for i, elem in enumerate(batch) if elem.type in ('R', 'A')]
+    prefixes = [batch[i].fields['prefix'] for i in announced]
+    valid = validate_prefixes(prefixes, bogon_index)
+    if pfx2as_index is not None:
+        valid &= match_prefixes(prefixes, pfx2as_index, mode)
+    usable = list()
+    for i, ok in zip(announced, valid.tolist()):
+        if ok:
+            candidate = batch[i].fields.get('as-path', '')
+            if is_usable_path(candidate):
+                # Single-spaced, like the paths of a saved dictionary, so every path has one id
+                usable.append((i, ' '.join(candidate.split())))
+    path_at = dict(zip([i for i, _ in usable], path_ids(state, [as_path for _, as_path in usable])))
+
+    for i, elem in enumerate(batch):
+        if checkpoint is not None:
+            checkpoint(state, elem.time)
+        peer = (elem.collector, elem.peer_asn, elem.peer_address)
+        if elem.type == 'S':
+            if elem.fields.get('new-state') != 'established':
+                withdraw_peer(state, peer)
+            continue
+        if elem.type not in ('R', 'A', 'W'):
+            continue
+        # An invalid announcement still implicitly withdraws the previous path of the peer
+        update_route(state, peer, elem.fields['prefix'], path_at.get(i))
+    flush_links(state)
+
+
+# Applies a RIB (baseline) or updates stream to the state
+def process_stream(state, stream, bogon_index, pfx2as_index=None, mode='exact', checkpoint=None,
+                   batch_size=UPDATE_BATCH):
+    batch = list()
+    for elem in stream:
+        batch.append(elem)
+        if len(batch) >= batch_size:
+            _apply_batch(state, batch, bogon_index, pfx2as_index, mode, checkpoint)
+            batch = list()
+    if batch:
+        _apply_batch(state, batch, bogon_index, pfx2as_index, mode, checkpoint)
+
+
+# Writes the current link counts in the countlinks.py output format, sorted by link
+def write_checkpoint(state, output_file):
+    flush_links(state)
+    keys, counts = state['links']
+    write_link_counts((keys, counts, np.arange(len(keys))), output_file)
+
+
+# Returns a callback that writes a checkpoint every `interval` seconds of BGP time, named after
+# the boundary it describes: all elements before the boundary are applied when it is written
+def make_checkpointer(output_prefix, interval):
+    next_boundary = [None]
+
+    def checkpoint(state, timestamp):
+        if next_boundary[0] is None:
+            next_boundary[0] = (int(timestamp) // interval + 1) * interval
+        if timestamp < next_boundary[0]:
+            return
+        boundary = (int(timestamp) // interval) * interval
+        write_checkpoint(state, f"{output_prefix}_{boundary}_as_links_count.csv")
+        next_boundary[0] = boundary + interval
+
+    return checkpoint
+
+
+# Saves the state to a directory of numpy files (prefixes, peers, routes, path dictionary, link
+# counts), so the next run can resume from the last checkpoint. The routes are saved as CSR, the
+# routes of peer i at offsets[i]:offsets[i + 1] of prefixes and paths. The directory is written
+# next to its final place and moved there at the end.
+def save_state(state, state_dir):
+    flush_links(state)
+    tmp_dir = state_dir + '.tmp'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    np.save(os.path.join(tmp_dir, 'prefixes.npy'), np.array(state['prefixes'], dtype='S'))
+    with open(os.path.join(tmp_dir, 'peers.json'), 'w') as f:
+        json.dump(state['peers'], f)
+    for peer_index in range(len(state['peers'])):
+        _merge_routes(state, peer_index)
+    route_offsets = np.zeros(len(state['peers']) + 1, dtype=np.int64)
+    np.cumsum([len(prefixes) for prefixes, _ in state['routes']], out=route_offsets[1:])
+    np.savez(os.path.join(tmp_dir, 'routes.npz'), offsets=route_offsets,
+             prefixes=np.concatenate([prefixes for prefixes, _ in state['routes']] + [np.zeros(0, dtype=np.int32)]),
+             paths=np.concatenate([paths for _, paths in state['routes']] + [np.zeros(0, dtype=np.int32)]))
+    save_path_dictionary(state['paths'], os.path.join(tmp_dir, 'paths.npz'))
+    keys, counts = state['links']
+    np.save(os.path.join(tmp_dir, 'link_keys.npy'), keys)
+    np.save(os.path.join(tmp_dir, 'link_counts.npy'), counts)
+    shutil.rmtree(state_dir, ignore_errors=True)
+    os.rename(tmp_dir, state_dir)
+
+
+def load_state(state_dir):
+    state = new_state()
+    state['prefixes'] = np.load(os.path.join(state_dir, 'prefixes.npy')).astype(str).tolist()
+    state['prefix_ids'] = {prefix: i for i, prefix in enumerate(state['prefixes'])}
+    with open(os.path.join(state_dir, 'peers.json'), 'r') as f:
+        state['peers'] = [tuple(peer) for peer in json.load(f)]
+    state['peer_ids'] = {peer: i for i, peer in enumerate(state['peers'])}
+    with np.load(os.path.join(state_dir, 'routes.npz')) as routes:
+        offsets, prefixes, paths = routes['offsets'], routes['prefixes'], routes['paths']
+    state['routes'] = [(prefixes[start:end], paths[start:end]) for start, end in zip(offsets[:-1], offsets[1:])]
+    state['pending'] = [dict() for _ in state['peers']]
+
+    hops, offsets = load_path_dictionary(os.path.join(state_dir, 'paths.npz'))
+    paths = state['paths']
+    paths['ids'] = {as_path: i for i, as_path in enumerate(path_strings(hops, offsets))}
+    if len(offsets) > 1:
+        paths['chunks'], paths['lengths'] = [hops], [np.diff(offsets)]
+    _add_path_links(state)
+
+    state['links'] = (np.load(os.path.join(state_dir, 'link_keys.npy')),
+                      np.load(os.path.join(state_dir, 'link_counts.npy')))
+    return state
+
+
+if __name__ == "__main__":
+    date = "2025-05-01"
+    collectors = COLLECTORS_PER_PROJECT['ris']
+    bogon_index = load_bogon_index('../../../green_routing-AS/bgpstream/ribs/bogon_index')
+    pfx2as_index = load_pfx2as_index(['routeviews-rv2-20250501-1200.pfx2as', 'routeviews-rv6-20250501-1200.pfx2as'])
+
+    # Seed the state from the RIB snapshots at midnight
+    state = new_state()
+    for collector in collectors:
+        process_stream(state, open_stream(date, collector, 'ris'), bogon_index, pfx2as_index)
+    write_checkpoint(state, f"{date}_baseline_as_links_count.csv")
+
+    # Replay the day's updates and write hourly checkpoints
+    updates = pybgpstream.BGPStream(from_time=f"{date} 00:00:00", until_time=f"{date} 23:59:59 UTC",
+                                    collectors=collectors, record_type="updates")
+    checkpoint = make_checkpointer(date, 3600)
+    process_stream(state, updates, bogon_index, pfx2as_index, checkpoint=checkpoint)
+    write_checkpoint(state, f"{date}_final_as_links_count.csv")
+    save_state(state, f"{date}_links_state")
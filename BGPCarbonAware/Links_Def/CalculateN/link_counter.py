@@ -0,0 +1,165 @@
+import csv
+import os
+import sys
+import numpy as np
+
+# The collector's columnar RIB format lives next to bgp_path_collector.py
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..', 'green_routing-AS', 'bgpstream'))
+from rib_columnar import parse_as_paths
+
+# Undirected links are packed into one uint64 key: min(a, b) << 32 | max(a, b).
+# Link counts are kept as three aligned arrays (keys, counts, first), sorted by key, where
+# first is the position at which the link was first seen, plus a dict of the links that have a
+# token which is not a 32-bit ASN (e.g. an AS set such as {1,2}) at one end:
+# {(as1, as2): [count, first]}, the ends ordered as strings. Writing the links in first-seen
+# order reproduces the row order of the Counter-based countlinks.py output exactly.
+
+# Paths parsed and counted together
+PATH_BATCH = 1 << 20
+
+MAX_ASN = (1 << 32) - 1
+
+
+# Link counts without any link
+def empty_link_counts():
+    return np.zeros(0, dtype=np.uint64), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), dict()
+
+
+# Parses space-separated AS paths into hops, offsets and the tokens that are not 32-bit ASNs,
+# as {index in hops: token}. Such tokens take a placeholder hop of 0, so the paths keep their
+# other links and the positions stay those of the original tokens.
+def parse_paths(as_paths):
+    try:
+        hops, offsets = parse_as_paths(as_paths)
+        return hops, offsets, dict()
+    except (ValueError, OverflowError):
+        pass
+    tokens = [path.split() for path in as_paths]
+    lengths = np.fromiter((len(hops) for hops in tokens), dtype=np.int64, count=len(tokens))
+    offsets = np.zeros(len(tokens) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    flat = [hop for path in tokens for hop in path]
+    named = {i: hop for i, hop in enumerate(flat)
+             if not (hop.isascii() and hop.isdigit() and int(hop) <= MAX_ASN)}
+    hops = np.array(['0' if i in named else hop for i, hop in enumerate(flat)], dtype=np.uint32)
+    return hops, offsets, named
+
+
+# Packs the consecutive hop pairs of every path into undirected link keys.
+# Returns the keys and the index of each pair in the flat hop array.
+def link_keys(hops, offsets):
+    if len(hops) < 2:
+        return np.zeros(0, dtype=np.uint64), np.zeros(0, dtype=np.int64)
+    valid = np.ones(len(hops) - 1, dtype=bool)
+    starts = offsets[1:-1]
+    valid[starts[(starts > 0) & (starts < len(hops))] - 1] = False
+    index = np.flatnonzero(valid)
+    a = hops[index].astype(np.uint64)
+    b = hops[index + 1].astype(np.uint64)
+    keys = (np.minimum(a, b) << np.uint64(32)) | np.maximum(a, b)
+    return keys, index
+
+
+# Counts the links of one batch of paths. Pair positions are numbered from position_base, so
+# batches must be given increasing bases. Pairs with a hop of tokens are counted by name.
+def count_links_batch(hops, offsets, position_base=0, tokens=None):
+    keys, index = link_keys(hops, offsets)
+    named = dict()
+    if tokens:
+        marked = np.zeros(len(hops), dtype=bool)
+        marked[list(tokens)] = True
+        by_name = marked[index] | marked[index + 1]
+        for i in index[by_name].tolist():
+            link = tuple(sorted((tokens.get(i, str(hops[i])), tokens.get(i + 1, str(hops[i + 1])))))
+            if link in named:
+                named[link][0] += 1
+            else:
+                named[link] = [1, position_base + i]
+        keys, index = keys[~by_name], index[~by_name]
+    if len(keys) == 0:
+        return (*empty_link_counts()[:3], named)
+    uniq, first_index, counts = np.unique(keys, return_index=True, return_counts=True)
+    return uniq, counts.astype(np.int64), position_base + index[first_index], named
+
+
+# Merges any number of link counts: counts are summed, the earliest first position is kept
+def merge_link_counts(*parts):
+    named = dict()
+    for part in parts:
+        for link, (count, first) in part[3].items():
+            if link in named:
+                named[link] = [named[link][0] + count, min(named[link][1], first)]
+            else:
+                named[link] = [count, first]
+    keys = np.concatenate([part[0] for part in parts])
+    counts = np.concatenate([part[1] for part in parts])
+    first = np.concatenate([part[2] for part in parts])
+    if len(keys) == 0:
+        return (*empty_link_counts()[:3], named)
+    order = np.lexsort((first, keys))
+    keys, counts, first = keys[order], counts[order], first[order]
+    boundaries = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+    return keys[boundaries], np.add.reduceat(counts, boundaries), first[boundaries], named
+
+
+# Counts links over the distinct paths of a dictionary instead of over rows: multiplicity[i] is the
+# number of rows carrying path i and first_row[i] the first of them. Links are numbered by
+# (first row, hop), which gives the same first-seen order as counting the rows one by one.
+def count_unique_paths(hops, offsets, multiplicity, first_row):
+    keys, index = link_keys(hops, offsets)
+    path_of_pair = np.searchsorted(offsets, index, side='right') - 1
+    used = multiplicity[path_of_pair] > 0
+    keys, index, path_of_pair = keys[used], index[used], path_of_pair[used]
+    if len(keys) == 0:
+        return empty_link_counts()
+    positions = (first_row[path_of_pair].astype(np.int64) << 16) + (index - offsets[path_of_pair])
+    weights = multiplicity[path_of_pair].astype(np.int64)
+    order = np.lexsort((positions, keys))
+    keys, positions, weights = keys[order], positions[order], weights[order]
+    boundaries = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+    return keys[boundaries], np.add.reduceat(weights, boundaries), positions[boundaries], dict()
+
+
+# Counts the links of a stream of (hops, offsets) or (hops, offsets, tokens) batches
+def count_link_batches(path_batches):
+    total = empty_link_counts()
+    position_base = 0
+    for batch in path_batches:
+        total = merge_link_counts(total, count_links_batch(*batch[:2], position_base, *batch[2:]))
+        position_base += len(batch[0])
+    return total
+
+
+# Groups space-separated AS path strings into parsed (hops, offsets, tokens) batches
+def batch_path_strings(as_paths, batch_size=PATH_BATCH):
+    batch = list()
+    for as_path in as_paths:
+        batch.append(as_path)
+        if len(batch) >= batch_size:
+            yield parse_paths(batch)
+            batch = list()
+    if batch:
+        yield parse_paths(batch)
+
+
+# Write results to output CSV: as1, as2, count, in first-seen order. Within a link the ASNs are
+# ordered as strings, like tuple(sorted((a, b))) in the Counter-based version.
+def write_link_counts(link_counts, output_file):
+    keys, counts, first = link_counts[:3]
+    low = (keys >> np.uint64(32)).astype(str)
+    high = (keys & np.uint64(MAX_ASN)).astype(str)
+    swap = low > high
+    as1 = np.where(swap, high, low).tolist()
+    as2 = np.where(swap, low, high).tolist()
+    counts, first = counts.tolist(), first.tolist()
+    named = link_counts[3] if len(link_counts) > 3 else dict()
+    for (a, b), (count, position) in named.items():
+        as1.append(a)
+        as2.append(b)
+        counts.append(count)
+        first.append(position)
+    order = np.argsort(np.asarray(first, dtype=np.int64), kind='stable').tolist()
+    with open(output_file, 'w', newline='') as f_out:
+        writer = csv.writer(f_out)
+        writer.writerow(['as1', 'as2', 'count'])  # header
+        writer.writerows((as1[i], as2[i], counts[i]) for i in order)
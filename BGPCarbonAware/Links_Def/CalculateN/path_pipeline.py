@@ -0,0 +1,69 @@
+import csv
+import os
+import sys
+
+# The collector and its columnar RIB format live in green_routing-AS/bgpstream
+COLLECTOR_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..', 'green_routing-AS', 'bgpstream')
+sys.path.append(COLLECTOR_DIR)
+from bgp_path_collector import build_tasks, open_stream, iter_valid_rib_elems
+from bogon_index import load_bogon_index
+from extract_prefix_paths import read_rib_prefix_paths
+from getprefixes import filter_rows
+from pfx2as_filter import load_pfx2as_index
+from link_counter import batch_path_strings, count_link_batches, write_link_counts
+
+# Streams collector output through extract_prefix_paths -> getprefixes -> countlinks in a single pass.
+# Every stage is a generator over [prefix, as_path] rows, so nothing is materialized on disk unless
+# debug_prefix is given, in which case the two intermediate CSVs of the step-by-step scripts are
+# written alongside.
+
+
+# Collects RIBs with BGPStream and projects every valid entry onto [prefix, as_path] rows
+def project_rib_stream(tasks, bogon_index_dir):
+    bogon_index = load_bogon_index(bogon_index_dir)
+    for date, collector, project in tasks:
+        stream = open_stream(date, collector, project)
+        for _, _, prefix, as_path in iter_valid_rib_elems(stream, bogon_index):
+            yield [prefix, as_path]
+
+
+# Writes the rows passing through to a pipe-separated CSV, for debugging only
+def tee_csv(rows, output_file):
+    with open(output_file, 'w', newline='') as f:
+        writer = csv.writer(f, delimiter='|')
+        for row in rows:
+            writer.writerow(row)
+            yield row
+
+
+# Filters the rows against pfx2as ('exact' or 'covering'), counts undirected links and writes as1,as2,count
+def run_pipeline(rows, pfx2as_files, output_file, debug_prefix=None, mode='exact'):
+    pfx2as_index = load_pfx2as_index(pfx2as_files)
+    if debug_prefix:
+        rows = tee_csv(rows, debug_prefix + '_prefixes_aspaths.csv')
+    rows = filter_rows(rows, pfx2as_index, mode)
+    if debug_prefix:
+        rows = tee_csv(rows, debug_prefix + '_filtered_prefixes_aspaths.csv')
+    as_paths = (row[1].strip() for row in rows if len(row) >= 2)
+    link_counts = count_link_batches(batch_path_strings(as_paths))
+    write_link_counts(link_counts, output_file)
+    return link_counts
+
+
+if __name__ == "__main__":
+    pfx2as_files = [
+        'routeviews-rv2-20250501-1200.pfx2as',  # IPv4
+        'routeviews-rv6-20250501-1200.pfx2as'   # IPv6
+    ]
+    output_file = '2025-05-01_as_links_count.csv'
+
+    # Either start from a collected RIB file, or set live to True to collect straight from
+    # BGPStream without writing the RIB to disk (with the bogon index bgp_path_collector.py saves)
+    live = False
+    if live:
+        rows = project_rib_stream(build_tasks(['2025-05-01']), os.path.join(COLLECTOR_DIR, 'ribs', 'bogon_index'))
+    else:
+        rows = read_rib_prefix_paths('2025-05-01_ribs.csv')
+
+    # Set debug_prefix='2025-05-01' to also write the intermediate CSVs
+    run_pipeline(rows, pfx2as_files, output_file, debug_prefix=None)
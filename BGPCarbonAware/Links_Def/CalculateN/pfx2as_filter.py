@@ -0,0 +1,94 @@
+import os
+import sys
+import numpy as np
+
+# Prefix parsing and integer keys are shared with the collector's bogon index
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..', 'green_routing-AS', 'bgpstream'))
+from prefix_arrays import MASK_64, parse_prefixes, v4_keys, v6_keys, isin_sorted
+from rib_columnar import parsed_prefixes
+
+# Prefixes are keyed as (integer network, length): network << 8 | length for IPv4 and 17-byte
+# (network, length) strings for IPv6, kept in sorted arrays and probed with np.searchsorted.
+# 'exact' keeps a prefix only if pfx2as announces that very prefix (like the original set
+# lookup), 'covering' keeps it if pfx2as announces it or any less specific prefix covering it.
+
+
+# Reads the prefixes of RouteViews .pfx2as files ("address<TAB>length<TAB>asn" per line)
+def read_pfx2as(filenames):
+    prefixes = list()
+    for filename in filenames:
+        with open(filename, 'r') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) < 2:
+                    continue
+                prefixes.append(f"{parts[0]}/{parts[1]}")
+    return prefixes
+
+
+# Builds the filter index from .pfx2as files; malformed lines are skipped
+def load_pfx2as_index(filenames):
+    parsed = parse_prefixes(read_pfx2as(filenames))
+    is_v4 = parsed['ok'] & ~parsed['v6']
+    is_v6 = parsed['ok'] & parsed['v6']
+    return {
+        'v4_keys': np.unique(v4_keys(parsed['lo'][is_v4], parsed['len'][is_v4])),
+        'v6_keys': np.unique(v6_keys(parsed['hi'][is_v6], parsed['lo'][is_v6], parsed['len'][is_v6])),
+        'v4_lengths': np.unique(parsed['len'][is_v4]),
+        'v6_lengths': np.unique(parsed['len'][is_v6]),
+    }
+
+
+# Clears the bits of a 64-bit word after the first `bits` bits
+def _mask_word(words, bits):
+    if bits <= 0:
+        return np.zeros_like(words)
+    bits = min(bits, 64)
+    return words & np.uint64((MASK_64 << (64 - bits)) & MASK_64)
+
+
+# Tests IPv4 networks: exact (network, length) match, or any announced length up to the query's
+def _match_v4(index, lo, length, mode):
+    if mode == 'exact':
+        return isin_sorted(index['v4_keys'], v4_keys(lo, length))
+    matched = np.zeros(len(lo), dtype=bool)
+    for plen in index['v4_lengths'].tolist():
+        candidates = np.flatnonzero(~matched & (length >= plen))
+        network = _mask_word(lo[candidates] << np.uint64(32), plen) >> np.uint64(32)
+        keys = v4_keys(network, np.full(len(candidates), plen, dtype=np.uint8))
+        matched[candidates[isin_sorted(index['v4_keys'], keys)]] = True
+    return matched
+
+
+# Tests IPv6 networks, same rules as _match_v4
+def _match_v6(index, hi, lo, length, mode):
+    if mode == 'exact':
+        return isin_sorted(index['v6_keys'], v6_keys(hi, lo, length))
+    matched = np.zeros(len(hi), dtype=bool)
+    for plen in index['v6_lengths'].tolist():
+        candidates = np.flatnonzero(~matched & (length >= plen))
+        network_hi = _mask_word(hi[candidates], plen)
+        network_lo = _mask_word(lo[candidates], plen - 64)
+        keys = v6_keys(network_hi, network_lo, np.full(len(candidates), plen, dtype=np.uint8))
+        matched[candidates[isin_sorted(index['v6_keys'], keys)]] = True
+    return matched
+
+
+# Tests prefixes parsed by prefix_arrays.parse_prefixes against the index
+def match_parsed(parsed, index, mode='exact'):
+    matched = np.zeros(len(parsed['ok']), dtype=bool)
+    is_v4 = np.flatnonzero(parsed['ok'] & ~parsed['v6'])
+    is_v6 = np.flatnonzero(parsed['ok'] & parsed['v6'])
+    matched[is_v4] = _match_v4(index, parsed['lo'][is_v4], parsed['len'][is_v4], mode)
+    matched[is_v6] = _match_v6(index, parsed['hi'][is_v6], parsed['lo'][is_v6], parsed['len'][is_v6], mode)
+    return matched
+
+
+# Tests a batch of prefix strings; invalid prefixes never match
+def match_prefixes(prefixes, index, mode='exact'):
+    return match_parsed(parse_prefixes(prefixes), index, mode)
+
+
+# Tests the prefixes of a collector Parquet batch without formatting them as strings
+def match_batch(batch, index, mode='exact'):
+    return match_parsed(parsed_prefixes(batch), index, mode)
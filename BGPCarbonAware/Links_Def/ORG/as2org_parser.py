@@ -1,70 +1,72 @@
 from pprint import pprint as pprint
 import csv
 import json
+import os
+import sys
+
+# CAIDA datasets are read through the shared loader in green_routing-AS/caida
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..', 'green_routing-AS', 'caida'))
+from caida_loader import open_text, load_as_rel, rel_ases
+
+# The ASN registry lives in green_routing-AS/registry
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..', 'green_routing-AS', 'registry'))
+from asn_registry import update_registry, set_organizations, save_registry
 
 # Writes content to a json file
 def write_json(jsonfilename, content):
     with open(jsonfilename, 'w+') as fp:
         json.dump(content, fp, indent=4)
 
-# Maps ASes to Organizations
+# Maps ASes to Organizations in a single streaming pass over the as2org dataset: the org section
+# (which comes first) fills org_id2org_name, the aut rows of public ASes are then mapped to their org
 def as2org(as2rel_url, as2org_url):
     as2org_dict = dict()
     org_id2org_name = dict()
-    public_asns = set()
-    as2rel_dict = dict()
-
-    # Unbox the as2rel dataset
-    with open(as2rel_url, 'r') as csvfile:
-        csvreader = csv.reader(csvfile, delimiter='|')
-        for row in csvreader:
-            if row[0][0] != '#':  # ignore lines starting with "#"
-                as1 = int(row[0])
-                as2 = int(row[1])
-                rel = int(row[2])
 
-                if as1 not in as2rel_dict:
-                    as2rel_dict[as1] = list()
-                as2rel_dict[as1].append([as2, rel])
-
-                if as2 not in as2rel_dict:
-                    as2rel_dict[as2] = list()
-                as2rel_dict[as2].append([as1, -rel])
-
-                # Add as1 and as2 in the public asns set
-                public_asns.add(as1)
-                public_asns.add(as2)
-    public_asns_list = list(public_asns)
+    # The ASes of the as2rel dataset are the public ones
+    public_asns = set(rel_ases(load_as_rel(as2rel_url)).tolist())
 
     # Unbox the as2org dataset
-    with open(as2org_url, 'r') as csvfile:
-        csvreader = csv.reader(csvfile, delimiter='|')
-        rows = list(csvreader)
-        for idx, row in enumerate(rows):
-            print('Mapping ASes to Organizations {}\r'.format(idx/len(rows)), end='')
-            if row[0][0] != '#':
-                # For this format org_id|changed|name|country|source we will map the org_id with the respective org_name
-                if(len(row) == 5):
-                    org_id = str(row[0])
-                    org_name = str(row[2])
-                    org_id2org_name[org_id] = org_name
-                # Consider only the entries in the following format: # format: aut|changed|aut_name|org_id|opaque_id|source 
-                # but not this format: org_id|changed|name|country|source
-                if(len(row) == 6):
-                    asn = int(row[0])
-                    as_name = str(row[2])
-                    # If the ASn is not visible on the public internet discard the entryå
-                    if asn not in public_asns_list: 
-                        continue
-                    org_id = str(row[3])
-                    org_name = org_id2org_name[org_id]
-                    as2org_dict[str(asn) + "_" + as_name] = [org_id, org_name]
+    with open_text(as2org_url) as csvfile:
+        for row in csv.reader(csvfile, delimiter='|'):
+            if not row or row[0].startswith('#'):
+                continue
+            # For this format org_id|changed|name|country|source we will map the org_id with the respective org_name
+            if len(row) == 5:
+                org_id2org_name[row[0]] = row[2]
+            # Consider only the entries in the following format: # format: aut|changed|aut_name|org_id|opaque_id|source
+            # but not this format: org_id|changed|name|country|source
+            elif len(row) == 6:
+                asn = int(row[0])
+                # If the ASn is not visible on the public internet discard the entry
+                if asn not in public_asns:
+                    continue
+                org_id = row[3]
+                as2org_dict[str(asn) + "_" + row[2]] = [org_id, org_id2org_name[org_id]]
     return as2org_dict
 
+# Stores the organization and AS name of every mapped AS in the ASN registry in registry_dir,
+# adding the ASes it lacks; orgs are numbered in order of first appearance
+def store_organizations(registry_dir, as2org_dict):
+    asns, as_names, as_org_ids = list(), list(), list()
+    org_names = dict()
+    for key, (org_id, org_name) in as2org_dict.items():
+        asn, _, as_name = key.partition('_')
+        asns.append(int(asn))
+        as_names.append(as_name)
+        as_org_ids.append(org_id)
+        org_names.setdefault(org_id, org_name)
+    registry = update_registry(registry_dir, asns)
+    set_organizations(registry, asns, as_names, as_org_ids, list(org_names), list(org_names.values()))
+    save_registry(registry, registry_dir)
+
 if __name__ == '__main__':
     as2rel_url = "20250501.as-rel2.txt"
     as2org_url = "20250501.as-org2info.txt"
     as2org_dict = as2org(as2rel_url, as2org_url)
     write_json("20250501.as-org2info.json", as2org_dict)
+    # Store the organizations in the snapshot's ASN registry, where the lookups read them
+    store_organizations("../../../green_routing-AS/registry/20250501", as2org_dict)
+    print(f"Mapped {len(as2org_dict)} public ASes to Organizations")
 
     
\ No newline at end of file
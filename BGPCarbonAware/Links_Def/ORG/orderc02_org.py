@@ -1,33 +1,25 @@
 import json
 import csv
+from org_index import load_org_registry, lookup_as_ids, org_of
 
-# Load the organization info
-with open("20250501.as-org2info.json", "r") as f:
-    as_org_info = json.load(f)
-
-# Map AS number to AS_ID and organization name
-as_number_to_info = {}
-for as_id, (unique_id, org_name) in as_org_info.items():
-    as_number = int(as_id.split("_")[0])
-    as_number_to_info[as_number] = {
-        "AS_ID": as_id,
-        "AS_Organization": org_name
-    }
+# Load the organizations of the snapshot's ASN registry (filled by as2org_parser.py)
+registry = load_org_registry("../../../green_routing-AS/registry/20250501")
 
 # Load CO₂ intensity values
 with open("as2co2_intensity_may_2025.json", "r") as f:
     as2co2 = json.load(f)
 
 # Build and filter the final data
+asns = [int(asn) for asn in as2co2]
+as_ids = lookup_as_ids(registry, asns)
+_, org_names = org_of(registry, asns)
 final_data = []
-for asn_str, co2 in as2co2.items():
-    asn = int(asn_str)
+for asn, as_id, org_name, co2 in zip(asns, as_ids, org_names, as2co2.values()):
     if co2 and co2 > 0.0:  # exclude zero or missing values
-        info = as_number_to_info.get(asn, {"AS_ID": None, "AS_Organization": None})
         final_data.append({
             "ASnumber": asn,
-            "AS_ID": info["AS_ID"],
-            "AS_Organization": info["AS_Organization"],
+            "AS_ID": as_id,
+            "AS_Organization": org_name,
             "CO2_Intensity": co2
         })
 
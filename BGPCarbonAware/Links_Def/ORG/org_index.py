@@ -0,0 +1,36 @@
+import os
+import sys
+import numpy as np
+
+# The ASN registry lives in green_routing-AS/registry
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..', 'green_routing-AS', 'registry'))
+from asn_registry import load_registry, require_attribute, org_of, as_name_of
+
+# Organization lookups on the snapshot's ASN registry, whose org and as_names columns
+# as2org_parser.py fills. Instead of scanning the "<asn>_<asname>" keys of the as2org JSON for
+# every lookup, a whole column of ASNs is joined to the registry with one np.searchsorted.
+
+
+# Loads a registry that has the organization columns
+def load_org_registry(registry_dir):
+    registry = load_registry(registry_dir)
+    require_attribute(registry, 'org', registry_dir)
+    require_attribute(registry, 'as_names', registry_dir)
+    return registry
+
+
+# The "<asn>_<asname>" key of the as2org JSON of every given ASN, None for ASNs without an org
+def lookup_as_ids(registry, asns):
+    org_ids, _ = org_of(registry, asns)
+    as_names = as_name_of(registry, asns)
+    return np.array([f"{int(asn)}_{as_name}" if org_id is not None else None
+                     for asn, as_name, org_id in zip(asns, as_names, org_ids)], dtype=object)
+
+
+# Adds <column>_org_id and <column>_org_name columns to a links DataFrame for every ASN column
+def enrich_links(links, registry, columns=('AS1', 'AS2')):
+    for column in columns:
+        org_ids, org_names = org_of(registry, links[column].to_numpy())
+        links[column + '_org_id'] = org_ids
+        links[column + '_org_name'] = org_names
+    return links
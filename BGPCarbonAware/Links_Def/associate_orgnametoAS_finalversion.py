@@ -1,45 +1,22 @@
-import csv
-import json
+import os
+import sys
+import pandas as pd
 
-# Load AS → Organization mapping
-with open("ORG/20250501.as-org2info.json", "r") as f:
-    as_org_map = json.load(f)
+# The ASN-keyed organization index lives in ORG/
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ORG'))
+from org_index import load_org_registry, enrich_links
 
-# Helper function to look up org info for an AS
-def find_org(asn):
-    for key in as_org_map:
-        if key.startswith(str(asn) + "_"):
-            return as_org_map[key]  # [org_id, org_name]
-    return [None, None]
+# Load AS → Organization mapping from the snapshot's ASN registry (filled by ORG/as2org_parser.py)
+registry = load_org_registry("../../green_routing-AS/registry/20250501")
 
-# Open the original CSV and the output CSV
-with open("as_links_sorted.csv", newline='') as infile, \
-     open("enriched_as_links.csv", "w", newline='') as outfile:
-    
-    reader = csv.DictReader(infile)
-    fieldnames = [
-        "AS1", "AS1_org_id", "AS1_org_name",
-        "AS2", "AS2_org_id", "AS2_org_name",
-        "Total_CO2"
-    ]
-    writer = csv.DictWriter(outfile, fieldnames=fieldnames)
-    writer.writeheader()
-
-    for row in reader:
-        as1 = int(row["AS1"])
-        as2 = int(row["AS2"])
-        co2 = float(row["Total_CO2"])
-
-        as1_org_id, as1_org_name = find_org(as1)
-        as2_org_id, as2_org_name = find_org(as2)
-
-        writer.writerow({
-            "AS1": as1,
-            "AS1_org_id": as1_org_id,
-            "AS1_org_name": as1_org_name,
-            "AS2": as2,
-            "AS2_org_id": as2_org_id,
-            "AS2_org_name": as2_org_name,
-            "Total_CO2": co2
-        })
+# Join both ends of every link to their organization at once
+links = pd.read_csv("as_links_sorted.csv", dtype={"AS1": "int64", "AS2": "int64", "Total_CO2": "float64"},
+                    float_precision="round_trip")
+links = enrich_links(links, registry)
 
+fieldnames = [
+    "AS1", "AS1_org_id", "AS1_org_name",
+    "AS2", "AS2_org_id", "AS2_org_name",
+    "Total_CO2"
+]
+links[fieldnames].to_csv("enriched_as_links.csv", index=False, lineterminator="\r\n")
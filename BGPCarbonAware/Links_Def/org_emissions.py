@@ -0,0 +1,101 @@
+import re
+import numpy as np
+import pandas as pd
+from scipy.sparse import coo_matrix
+
+# Organization-level rollup of the link emissions of enriched_as_links.csv. Both ends of every
+# link are mapped to the number of their org id (the as2org org of the ASN registry), and the
+# emissions are accumulated into a sparse source org x destination org matrix plus the per-org
+# totals (emissions of every link an org is on, as source or destination). The org name is only
+# a display label, cleaned once per org, so two orgs sharing a name stay apart. Top-N rankings
+# and heatmap submatrices are then read from the rollup, never from the link table.
+# A rollup is a dict:
+#   orgs    org ids, the rows/columns of the matrix
+#   names   cleaned org name of every org, its label (with the org id when orgs share a name)
+#   matrix  CSR org x org matrix of summed emissions; only org pairs with links are stored
+#   totals  total emissions per org
+
+
+# Strips the Inc/LLC suffixes from an org name
+def clean_org_name(name):
+    if pd.isna(name):
+        return name
+    name = re.sub(r'\s*,?\s*\b(inc|llc)\b\.?', '', name, flags=re.IGNORECASE)
+    return name.strip()
+
+
+# Accumulates the links' emissions per org pair and per org; ends without an org id (code -1)
+# are left out
+def org_rollup(links, source='AS1_org_id', target='AS2_org_id', value='Total_CO2',
+               labels=('AS1_org_name', 'AS2_org_name')):
+    codes, orgs = pd.factorize(pd.concat([links[source], links[target]], ignore_index=True))
+    src, dst = codes[:len(links)], codes[len(links):]
+    co2 = links[value].to_numpy(dtype=np.float64)
+
+    # Label every org with the cleaned name of its first end
+    raw_names = pd.concat([links[labels[0]], links[labels[1]]], ignore_index=True).to_numpy(dtype=object)
+    ends = np.flatnonzero(codes >= 0)[::-1]
+    first_end = np.zeros(len(orgs), dtype=np.int64)
+    first_end[codes[ends]] = ends
+    names = np.array([clean_org_name(name) for name in raw_names[first_end]], dtype=object)
+    # Orgs that share a name are told apart by their id, so every label stays unique
+    shared = pd.Series(names).duplicated(keep=False).to_numpy()
+    names[shared] = [f"{name} ({org_id})" for name, org_id in zip(names[shared], orgs[shared])]
+
+    n = len(orgs)
+    totals = np.bincount(src[src >= 0], weights=co2[src >= 0], minlength=n) \
+        + np.bincount(dst[dst >= 0], weights=co2[dst >= 0], minlength=n)
+    paired = (src >= 0) & (dst >= 0)
+    matrix = coo_matrix((co2[paired], (src[paired], dst[paired])), shape=(n, n)).tocsr()
+    return {'orgs': np.asarray(orgs, dtype=object), 'names': names, 'matrix': matrix, 'totals': totals}
+
+
+# Org numbers of the n highest-emitting orgs, highest first
+def top_orgs(rollup, n):
+    return np.argsort(-rollup['totals'], kind='stable')[:n]
+
+
+# Org numbers of the given org ids
+def org_numbers(rollup, org_ids):
+    number_of = {org_id: i for i, org_id in enumerate(rollup['orgs'])}
+    return np.array([number_of[org_id] for org_id in org_ids], dtype=np.int64)
+
+
+# Dense source x destination table of the given org numbers (all orgs of rows when columns is
+# None), labelled by org name like a pivot_table; NaN where two orgs share no link
+def org_submatrix(rollup, rows, columns=None):
+    rows = np.asarray(rows, dtype=np.int64)
+    columns = rows if columns is None else np.asarray(columns, dtype=np.int64)
+    block = rollup['matrix'][rows][:, columns].tocoo()
+    values = np.full((len(rows), len(columns)), np.nan)
+    values[block.row, block.col] = block.data
+    return pd.DataFrame(values, index=pd.Index(rollup['names'][rows], name='AS1_org_name'),
+                        columns=pd.Index(rollup['names'][columns], name='AS2_org_name'))
+
+
+# Heatmap table of the n highest-emitting orgs
+def top_org_matrix(rollup, n):
+    return org_submatrix(rollup, top_orgs(rollup, n))
+
+
+# Per-org totals, highest first, as an Organization / CO2 Emissions table
+def org_totals_frame(rollup):
+    order = top_orgs(rollup, len(rollup['orgs']))
+    return pd.DataFrame({'Organization': rollup['names'][order], 'CO2 Emissions': rollup['totals'][order]})
+
+
+# Writes the per-org totals in the layout of processed_org_emissions.csv: lowest first, two decimals
+def write_org_totals(rollup, csvfilename):
+    org_totals_frame(rollup).iloc[::-1].to_csv(csvfilename, index=False, float_format='%.2f')
+
+
+# Reads the enriched links, keeping those with emissions
+def read_enriched_links(csvfilename):
+    links = pd.read_csv(csvfilename)
+    return links[links["Total_CO2"] > 0]
+
+
+if __name__ == "__main__":
+    rollup = org_rollup(read_enriched_links("enriched_as_links.csv"))
+    write_org_totals(rollup, "../processed_org_emissions.csv")
+    print(f"Saved: ../processed_org_emissions.csv ({len(rollup['orgs'])} organizations, {rollup['matrix'].nnz} org pairs)")
@@ -2,38 +2,15 @@ import pandas as pd
 import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
-import re
+from org_emissions import org_rollup, top_org_matrix
 
 # Load data
 df = pd.read_csv("enriched_as_links.csv")
 df = df[df["Total_CO2"] > 0].copy()
 
-# Clean organization names
-def clean_org_name(name):
-    if pd.isna(name):
-        return name
-    name = re.sub(r'\s*,?\s*\b(inc|llc)\b\.?', '', name, flags=re.IGNORECASE)
-    return name.strip()
-
-df["AS1_org_name"] = df["AS1_org_name"].apply(clean_org_name)
-df["AS2_org_name"] = df["AS2_org_name"].apply(clean_org_name)
-
-# Compute total emissions per organization
-org1_totals = df.groupby("AS1_org_name")["Total_CO2"].sum()
-org2_totals = df.groupby("AS2_org_name")["Total_CO2"].sum()
-org_totals = (org1_totals.add(org2_totals, fill_value=0)).sort_values(ascending=False)
-
-# Select top 10 organizations
-top_orgs = org_totals.head(10).index
-df_top = df[df["AS1_org_name"].isin(top_orgs) & df["AS2_org_name"].isin(top_orgs)]
-
-# Create pivot table
-pivot = df_top.pivot_table(
-    index="AS1_org_name",
-    columns="AS2_org_name",
-    values="Total_CO2",
-    aggfunc="sum"
-).reindex(index=top_orgs, columns=top_orgs)
+# Roll the links up per organization and take the table of the top 10
+rollup = org_rollup(df)
+pivot = top_org_matrix(rollup, 10)
 
 # Create base heatmap (without text annotations)
 fig = go.Figure(data=go.Heatmap(
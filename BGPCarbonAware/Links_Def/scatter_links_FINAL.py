@@ -2,7 +2,7 @@ import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 import numpy as np
-import re
+from org_emissions import org_rollup, top_org_matrix
 
 # Imposta font grandi globalmente
 plt.rcParams.update({
@@ -19,36 +19,9 @@ df = pd.read_csv("enriched_as_links.csv")
 # Filtra emissioni non nulle
 df = df[df["Total_CO2"] > 0].copy()
 
-# Funzione per ripulire i nomi
-def clean_org_name(name):
-    if pd.isna(name):
-        return name
-    name = re.sub(r'\s*,?\s*\b(inc|llc)\b\.?', '', name, flags=re.IGNORECASE)
-    return name.strip()
-
-# Pulisci nomi delle organizzazioni
-df["AS1_org_name"] = df["AS1_org_name"].apply(clean_org_name)
-df["AS2_org_name"] = df["AS2_org_name"].apply(clean_org_name)
-
-# Calcola emissioni totali per organizzazione
-org1_totals = df.groupby("AS1_org_name")["Total_CO2"].sum()
-org2_totals = df.groupby("AS2_org_name")["Total_CO2"].sum()
-org_totals = (org1_totals.add(org2_totals, fill_value=0)).sort_values(ascending=False)
-
-# Seleziona le 20 organizzazioni principali
-top_orgs = org_totals.head(10).index
-
-# Filtra dati per le top 20
-df_top = df[df["AS1_org_name"].isin(top_orgs) & df["AS2_org_name"].isin(top_orgs)]
-
-# Matrice pivot
-pivot = df_top.pivot_table(
-    index="AS1_org_name",
-    columns="AS2_org_name",
-    values="Total_CO2",
-    aggfunc="sum"
-)
-pivot = pivot.reindex(index=top_orgs, columns=top_orgs)
+# Aggrega i link per organizzazione e prendi la matrice delle top 10
+rollup = org_rollup(df)
+pivot = top_org_matrix(rollup, 10)
 
 # Crea la figura
 plt.figure(figsize=(22, 20))
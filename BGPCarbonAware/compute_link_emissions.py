@@ -0,0 +1,97 @@
+import json
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+# The ASN registry lives in green_routing-AS/registry
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'green_routing-AS', 'registry'))
+from asn_registry import load_registry, require_attribute
+
+# Computes per-link emissions (as_link_emissions_*.csv) from the link counts of countlinks.py
+# (as1,as2,count) and the per-AS intensities of map_co2_to_asn.py ({asn: gCO2/kWh}).
+# Intensities are kept in two aligned arrays sorted by ASN (those of the ASN registry, or read
+# from the intensities JSON), so both ends of every link are looked up at once with
+# np.searchsorted. Formulas, per link:
+#   sum             AS1_CO2 + AS2_CO2
+#   mean            (AS1_CO2 + AS2_CO2) / 2
+#   count_weighted  Count * (AS1_CO2 + AS2_CO2)
+# Links with an AS of unknown intensity are dropped unless keep_missing is set, in which case
+# their CO2 columns are left empty.
+
+FORMULAS = ('sum', 'mean', 'count_weighted')
+
+
+# Reads the per-AS intensities into (sorted asns, intensities) arrays
+def load_intensities(jsonfilename):
+    with open(jsonfilename, 'r') as f:
+        as_co2_intensity = json.load(f)
+    asns = np.array([int(asn) for asn in as_co2_intensity], dtype=np.int64)
+    values = np.array([np.nan if v is None else v for v in as_co2_intensity.values()], dtype=np.float64)
+    order = np.argsort(asns, kind='stable')
+    return asns[order], values[order]
+
+
+# Reads the intensities of a saved ASN registry, whose ASNs are already sorted
+def load_registry_intensities(registry_dir):
+    registry = load_registry(registry_dir)
+    require_attribute(registry, 'intensity', registry_dir)
+    return np.asarray(registry['asns'], dtype=np.int64), np.asarray(registry['intensity'], dtype=np.float64)
+
+
+# Intensity of every ASN of the query array; NaN for ASNs without one
+def lookup_intensities(intensities, query):
+    asns, values = intensities
+    if len(asns) == 0:
+        return np.full(len(query), np.nan)
+    idx = np.searchsorted(asns, query)
+    idx[idx == len(asns)] = 0
+    return np.where(asns[idx] == query, values[idx], np.nan)
+
+
+# Reads the as1,as2,count CSV of countlinks.py
+def read_link_counts(csvfilename):
+    return pd.read_csv(csvfilename, dtype={'as1': np.int64, 'as2': np.int64, 'count': np.int64})
+
+
+# Builds the emissions table of the links: AS1, AS2, Count, AS1_CO2, AS2_CO2, Total_CO2
+def link_emissions(links, intensities, formula='count_weighted', keep_missing=False):
+    if formula not in FORMULAS:
+        raise ValueError(f"unknown formula {formula}, expected one of {FORMULAS}")
+    as1 = links['as1'].to_numpy()
+    as2 = links['as2'].to_numpy()
+    count = links['count'].to_numpy()
+    co2_1 = lookup_intensities(intensities, as1)
+    co2_2 = lookup_intensities(intensities, as2)
+    if formula == 'sum':
+        total = co2_1 + co2_2
+    elif formula == 'mean':
+        total = (co2_1 + co2_2) / 2
+    else:
+        total = count * (co2_1 + co2_2)
+    emissions = pd.DataFrame({'AS1': as1, 'AS2': as2, 'Count': count,
+                              'AS1_CO2': co2_1, 'AS2_CO2': co2_2, 'Total_CO2': total})
+    if not keep_missing:
+        emissions = emissions[~np.isnan(total)].reset_index(drop=True)
+    return emissions
+
+
+# Writes the table as CSV, or as Parquet when the file name ends in .parquet
+def write_link_emissions(emissions, output_file):
+    if output_file.endswith('.parquet'):
+        emissions.to_parquet(output_file, index=False, compression='zstd')
+    else:
+        emissions.to_csv(output_file, index=False)
+
+
+if __name__ == "__main__":
+    links = read_link_counts('Links_Def/CalculateN/2025-05-01_as_links_count.csv')
+    # Prefer the snapshot's ASN registry, fall back to the intensities JSON
+    registry_dir = '../green_routing-AS/registry/20250501'
+    if os.path.isdir(registry_dir):
+        intensities = load_registry_intensities(registry_dir)
+    else:
+        intensities = load_intensities('as2co2_intensity_may_2025.json')
+    emissions = link_emissions(links, intensities, formula='count_weighted')
+    write_link_emissions(emissions, 'as_link_emissions_may_2025.csv')
+    print(f"Computed emissions of {len(emissions)} links ({len(links) - len(emissions)} without intensity)")
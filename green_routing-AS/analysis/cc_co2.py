@@ -1,12 +1,14 @@
-import bz2
-import csv
+import os
 import sys
-import io
 import json
 from pprint import pprint as pprint
 import matplotlib.pyplot as plt
 import numpy as np
 
+# CAIDA datasets are read through the shared loader in ../caida
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'caida'))
+from caida_loader import load_ppdc, cone_dict
+
 def plot_total_cone_co2_vs_size(as2cone, as2co2, include_self=False, log_scale=False):
     """
     Plots total customer cone CO₂ vs. cone size for each AS.
@@ -56,32 +58,10 @@ def plot_total_cone_co2_vs_size(as2cone, as2co2, include_self=False, log_scale=F
     plt.tight_layout()
     plt.savefig("output/co2_vs_cc.png")
 
-def read_topology(as2rel_mapping):
-    as2cone = {}
-
-    with bz2.BZ2File(as2rel_mapping, 'rb') as compressed_file:
-        decompressed_text = compressed_file.read().decode('utf-8')
-        file_like = io.StringIO(decompressed_text)
-        csvreader = csv.reader(file_like, delimiter=' ')
-
-        for row in csvreader:
-            if not row or row[0].startswith('#'):
-                continue  # Skip comments and empty lines
-
-            root_as = row[0]
-            customer_ases = set(row[1:])  # remove duplicates per line
-
-            if root_as not in as2cone:
-                as2cone[root_as] = set()
-
-            as2cone[root_as].update(customer_ases)  # add new customers uniquely
-
-    # Convert all sets to lists if needed
-    as2cone = {k: list(v) for k, v in as2cone.items()}
-
-    return as2cone
+# Reads the customer cones of ppdc-ases as {root: list of customer ASNs}
+def read_topology(ppdc_mapping):
+    return cone_dict(load_ppdc(ppdc_mapping))
 
-csv.field_size_limit(sys.maxsize)
 cc = read_topology('../caida/20250501.ppdc-ases.txt.bz2')
 # Load data
 with open('../as2co2_mapping/output/as2co2_intensity_may_2025.json') as f:
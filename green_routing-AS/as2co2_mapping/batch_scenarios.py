@@ -0,0 +1,137 @@
+import csv
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+from map_co2_to_asn import read_json, iso3_to_iso2, presence_matrix, weighted_intensities
+
+# Evaluates AS carbon intensities under many grid-intensity scenarios at once.
+# Every scenario is a country -> intensity mapping (Green Web Foundation averages, the 2021
+# marginal intensities, projections...). The scenarios are stacked into a country x scenario
+# matrix, so the presence matrix is built once and all AS intensities come out of one sparse
+# product. Results are written as one Parquet file (asn + one column per scenario), and the
+# rankings the scenarios induce are compared pairwise: Spearman correlation of the AS ranks and
+# Jaccard overlap of the top-k greenest ASes.
+
+
+# Country (ISO2) -> intensity of a scenario JSON keyed by ISO3 or ISO2 codes. Values are either
+# GWF records ({"emissions_intensity_gco2_per_kwh": ...}) or plain numbers.
+def read_scenario_json(jsonfilename):
+    co2_map = dict()
+    for code, value in read_json(jsonfilename).items():
+        if isinstance(value, dict):
+            value = value.get('emissions_intensity_gco2_per_kwh')
+        if value is None or value == '':
+            continue
+        iso2 = code if len(code) == 2 else iso3_to_iso2(code)
+        if iso2 is not None:
+            co2_map[iso2] = float(value)
+    return co2_map
+
+
+# Scenarios of a wide CSV: first column the country (ISO2 or ISO3), one column per scenario.
+# Returns {scenario name: co2 map}; empty cells mean no intensity for that country.
+def read_scenario_csv(csvfilename):
+    with open(csvfilename, 'r', newline='') as f:
+        reader = csv.reader(f)
+        names = next(reader)[1:]
+        scenarios = {name: dict() for name in names}
+        for row in reader:
+            if not row:
+                continue
+            iso2 = row[0] if len(row[0]) == 2 else iso3_to_iso2(row[0])
+            if iso2 is None:
+                continue
+            for name, value in zip(names, row[1:]):
+                if value != '':
+                    scenarios[name][iso2] = float(value)
+    return scenarios
+
+
+# Stacks scenarios into a country x scenario matrix aligned with the presence matrix's countries
+def scenario_matrix(scenarios, countries):
+    matrix = np.full((len(countries), len(scenarios)), np.nan)
+    for j, co2_map in enumerate(scenarios.values()):
+        for i, country in enumerate(countries):
+            value = co2_map.get(country)
+            if value is not None:
+                matrix[i, j] = value
+    return matrix
+
+
+# AS x scenario intensity matrix; NaN where an AS has no country with a known intensity
+def evaluate_scenarios(presence, scenarios):
+    return weighted_intensities(presence, scenario_matrix(scenarios, presence['countries']))
+
+
+# Writes the AS x scenario matrix as one Parquet file
+def write_scenarios(output_file, asns, names, intensities):
+    columns = {'asn': pa.array(np.array(asns, dtype=np.uint32))}
+    for j, name in enumerate(names):
+        columns[name] = pa.array(intensities[:, j], from_pandas=True)
+    pq.write_table(pa.table(columns), output_file, compression='zstd')
+
+
+# Ranks of every row of a scenario x AS matrix (ties get their average rank, like
+# scipy.stats.rankdata), computed from one sort per row. Returns (ranks, order).
+def scenario_ranks(values):
+    count = values.shape[1]
+    order = np.argsort(values, axis=1, kind='stable')
+    sorted_values = np.take_along_axis(values, order, axis=1)
+    new_tie = np.ones(values.shape, dtype=bool)
+    new_tie[:, 1:] = sorted_values[:, 1:] != sorted_values[:, :-1]
+    new_tie = new_tie.ravel()
+    starts = np.flatnonzero(new_tie)
+    sizes = np.diff(np.append(starts, new_tie.size))
+    average = (starts % count) + (sizes + 1) / 2
+    ranks = np.empty(values.shape)
+    np.put_along_axis(ranks, order, average[np.cumsum(new_tie) - 1].reshape(values.shape), axis=1)
+    return ranks, order
+
+
+# Pairwise rank-stability statistics over the ASes with an intensity in every scenario:
+# Spearman correlation of the AS ranks, and Jaccard overlap of the top_k lowest-intensity ASes
+def rank_stability(intensities, top_k=1000):
+    complete = np.ascontiguousarray(intensities[~np.isnan(intensities).any(axis=1)].T)
+    scenarios, ases = complete.shape
+    ranks, order = scenario_ranks(complete)
+    if ases > 1:
+        spearman = np.corrcoef(ranks).reshape(scenarios, scenarios)
+    else:
+        spearman = np.full((scenarios, scenarios), np.nan)
+    top_k = min(top_k, ases)
+    in_top = np.zeros(complete.shape)
+    np.put_along_axis(in_top, order[:, :top_k], 1.0, axis=1)
+    shared = in_top @ in_top.T
+    with np.errstate(invalid='ignore'):
+        jaccard = shared / (2 * top_k - shared)
+    return {'ases': ases, 'top_k': top_k, 'spearman': spearman, 'jaccard': jaccard}
+
+
+# Writes the pairwise statistics as scenario_a,scenario_b,spearman,top_k_jaccard rows
+def write_rank_stability(output_file, names, stability):
+    with open(output_file, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['scenario_a', 'scenario_b', 'spearman', f"top_{stability['top_k']}_jaccard"])
+        for a in range(len(names)):
+            for b in range(a + 1, len(names)):
+                writer.writerow([names[a], names[b], stability['spearman'][a, b], stability['jaccard'][a, b]])
+
+
+if __name__ == '__main__':
+    peeringdb_data = read_json('../geolocate/output/presence_per_AS_peeringdb_may_2025.json')
+    maxmind_data = read_json('../geolocate/output/presence_per_AS_maxmind_may_2025.json')
+
+    scenarios = dict()
+    scenarios['gwf_may_2025'] = read_scenario_json("../green_web_foundation/gwf_average-intensities_last_updated_may_2025.json")
+    scenarios['gwf_jan_2025'] = read_scenario_json("../green_web_foundation/gwf_average-intensities_last_updated_jan_2025.json")
+    # Further scenarios, e.g. the 2021 marginal intensities or projections (one column per year):
+    # scenarios['marginal_2021'] = read_scenario_json("../green_web_foundation/marginal-intensities-2021.json")
+    # scenarios.update(read_scenario_csv("../green_web_foundation/projections.csv"))
+
+    presence = presence_matrix(maxmind_data, peeringdb_data)
+    intensities = evaluate_scenarios(presence, scenarios)
+    write_scenarios("output/as2co2_intensity_scenarios_may_2025.parquet", presence['asns'], list(scenarios), intensities)
+
+    stability = rank_stability(intensities)
+    write_rank_stability("output/as2co2_rank_stability_may_2025.csv", list(scenarios), stability)
+    print(f"Compared {len(scenarios)} scenarios over {stability['ases']} ASes")
@@ -0,0 +1,138 @@
+import csv
+import json
+import os
+import shutil
+import zlib
+from datetime import datetime, timezone
+import numpy as np
+from map_co2_to_asn import read_json, iso3_to_iso2, presence_matrix, weighted_intensities
+
+# Hourly AS carbon intensity. A local country x hour intensity table is combined with the AS x
+# country presence matrix into an AS x hour matrix, computed one band of ASes at a time so only
+# that band is in memory. The matrix is stored chunked: a directory holding meta.json (ASNs,
+# hours, chunk shape), chunks.bin (every chunk as byte-shuffled, zlib-compressed float32) and
+# index.npy (offset and length of every chunk). A single AS's series or a single hour's snapshot
+# only reads the chunks of one row or one column of the chunk grid.
+
+# Chunk shape: ASes x hours (one week)
+AS_CHUNK = 256
+HOUR_CHUNK = 168
+
+
+# Reads a long-format hourly intensity CSV with the columns country (ISO2 or ISO3), datetime
+# (ISO 8601, UTC) and intensity. Returns {'hours': sorted hour strings, 'countries': ISO2
+# codes, 'values': country x hour array}, NaN where a country has no value for an hour.
+def read_hourly_intensities(csvfilename):
+    rows = list()
+    with open(csvfilename, 'r', newline='') as f:
+        for row in csv.DictReader(f):
+            if row['intensity'] == '':
+                continue
+            code = row['country']
+            iso2 = code if len(code) == 2 else iso3_to_iso2(code)
+            if iso2 is None:
+                continue
+            hour = datetime.fromisoformat(row['datetime'].replace('Z', '+00:00'))
+            if hour.tzinfo is not None:
+                hour = hour.astimezone(timezone.utc).replace(tzinfo=None)
+            rows.append((iso2, hour.replace(minute=0, second=0, microsecond=0).isoformat(), float(row['intensity'])))
+    hours = sorted({hour for _, hour, _ in rows})
+    countries = sorted({country for country, _, _ in rows})
+    hour_index = {hour: i for i, hour in enumerate(hours)}
+    country_index = {country: i for i, country in enumerate(countries)}
+    values = np.full((len(countries), len(hours)), np.nan)
+    for country, hour, intensity in rows:
+        values[country_index[country], hour_index[hour]] = intensity
+    return {'hours': hours, 'countries': countries, 'values': values}
+
+
+# Aligns the intensity table with the presence matrix's countries
+def hourly_matrix(table, countries):
+    row_of = {country: i for i, country in enumerate(table['countries'])}
+    matrix = np.full((len(countries), len(table['hours'])), np.nan)
+    for i, country in enumerate(countries):
+        if country in row_of:
+            matrix[i] = table['values'][row_of[country]]
+    return matrix
+
+
+# Byte-shuffles and compresses a float32 chunk; shuffling groups the bytes of equal rank, which
+# compresses much better for slowly varying series
+def _pack_chunk(chunk):
+    return zlib.compress(np.ascontiguousarray(chunk, dtype=np.float32).view(np.uint8).reshape(-1, 4).T.tobytes(), 6)
+
+
+def _unpack_chunk(data, shape):
+    shuffled = np.frombuffer(zlib.decompress(data), dtype=np.uint8).reshape(4, -1)
+    return np.ascontiguousarray(shuffled.T).view(np.float32).reshape(shape)
+
+
+# Computes the AS x hour intensities and writes them to a chunked store, one band of as_chunk
+# ASes at a time. The store is written to a temporary directory and moved into place at the end.
+def write_hourly_store(store_dir, presence, table, as_chunk=AS_CHUNK, hour_chunk=HOUR_CHUNK):
+    intensities = hourly_matrix(table, presence['countries'])
+    n_ases, n_hours = len(presence['asns']), len(table['hours'])
+    as_chunks = -(-n_ases // as_chunk)
+    hour_chunks = -(-n_hours // hour_chunk)
+    index = np.zeros((as_chunks, hour_chunks, 2), dtype=np.int64)
+
+    tmp_dir = store_dir + '.tmp'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    with open(os.path.join(tmp_dir, 'chunks.bin'), 'wb') as f:
+        for i in range(as_chunks):
+            band = {'matrix': presence['matrix'][i * as_chunk:(i + 1) * as_chunk]}
+            values = weighted_intensities(band, intensities)
+            for j in range(hour_chunks):
+                data = _pack_chunk(values[:, j * hour_chunk:(j + 1) * hour_chunk])
+                index[i, j] = f.tell(), len(data)
+                f.write(data)
+    np.save(os.path.join(tmp_dir, 'index.npy'), index)
+    meta = {'asns': presence['asns'], 'hours': table['hours'], 'as_chunk': as_chunk, 'hour_chunk': hour_chunk}
+    with open(os.path.join(tmp_dir, 'meta.json'), 'w') as f:
+        json.dump(meta, f)
+    shutil.rmtree(store_dir, ignore_errors=True)
+    os.rename(tmp_dir, store_dir)
+
+
+# Opens a store for reading
+def open_hourly_store(store_dir):
+    with open(os.path.join(store_dir, 'meta.json'), 'r') as f:
+        store = json.load(f)
+    store['dir'] = store_dir
+    store['index'] = np.load(os.path.join(store_dir, 'index.npy'))
+    store['as_row'] = {asn: i for i, asn in enumerate(store['asns'])}
+    store['hour_column'] = {hour: i for i, hour in enumerate(store['hours'])}
+    return store
+
+
+# Reads chunk (i, j) of the grid
+def _read_chunk(store, f, i, j):
+    offset, length = store['index'][i, j].tolist()
+    f.seek(offset)
+    rows = min(store['as_chunk'], len(store['asns']) - i * store['as_chunk'])
+    columns = min(store['hour_chunk'], len(store['hours']) - j * store['hour_chunk'])
+    return _unpack_chunk(f.read(length), (rows, columns))
+
+
+# Hourly intensity series of one AS, aligned with store['hours']; NaN where unknown
+def read_as_series(store, asn):
+    i, row = divmod(store['as_row'][str(asn)], store['as_chunk'])
+    with open(os.path.join(store['dir'], 'chunks.bin'), 'rb') as f:
+        return np.concatenate([_read_chunk(store, f, i, j)[row] for j in range(store['index'].shape[1])])
+
+
+# Intensity of every AS at one hour (an ISO 8601 string as in store['hours']), aligned with store['asns']
+def read_hour_snapshot(store, hour):
+    j, column = divmod(store['hour_column'][hour], store['hour_chunk'])
+    with open(os.path.join(store['dir'], 'chunks.bin'), 'rb') as f:
+        return np.concatenate([_read_chunk(store, f, i, j)[:, column] for i in range(store['index'].shape[0])])
+
+
+if __name__ == '__main__':
+    peeringdb_data = read_json('../geolocate/output/presence_per_AS_peeringdb_may_2025.json')
+    maxmind_data = read_json('../geolocate/output/presence_per_AS_maxmind_may_2025.json')
+    table = read_hourly_intensities('../green_web_foundation/hourly_intensities_2025.csv')
+
+    presence = presence_matrix(maxmind_data, peeringdb_data)
+    write_hourly_store('output/as2co2_hourly_2025', presence, table)
@@ -5,9 +5,17 @@ import pycountry
 import json
 from pprint import pprint as pprint
 from collections import defaultdict
+from functools import lru_cache
 import numpy as np
+import scipy.sparse as sp
 import matplotlib.pyplot as plt
 import pandas as pd
+import os
+import sys
+
+# The ASN registry lives in ../registry
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'registry'))
+from asn_registry import update_registry, set_attribute, save_registry
 
 # Reads content of JSON file and returns
 def read_json(jsonfilename):
@@ -20,6 +28,7 @@ def write_json(jsonfilename, content):
         json.dump(content, fp, indent=4)
 
 # Converts ISO3 to ISO2
+@lru_cache(maxsize=None)
 def iso3_to_iso2(iso3):
     try:
         return pycountry.countries.get(alpha_3=iso3).alpha_2
@@ -94,6 +103,84 @@ def calculate_co2_intensity_per_as(enriched_data):
 
     return as_co2_intensity
 
+# Builds the merged presence of every AS as a sparse AS x country matrix, normalized like
+# merge_datasets. Returns {'asns', 'countries', 'matrix'}; rows follow the order in which ASes
+# appear in the datasets and the entries of a row the order in which its countries appear, so
+# every sum runs in the same order as with the nested dicts and gives the same floats.
+def presence_matrix(maxmind_data, peeringdb_data):
+    asn_index = dict()
+    country_index = dict()
+    rows, cols, values = list(), list(), list()
+
+    def add(asn, country, presence):
+        rows.append(asn_index.setdefault(asn, len(asn_index)))
+        cols.append(country_index.setdefault(country, len(country_index)))
+        values.append(presence)
+
+    for asn, data in maxmind_data.items():
+        for ip_type in ['ipv4', 'ipv6']:
+            for country, presence in data.get(ip_type, {}).items():
+                add(asn, country, presence)
+    for asn, data in peeringdb_data.items():
+        for country, presence in data.items():
+            add(asn, country, presence)
+
+    # Sum repeated (AS, country) entries in order, then group entries by AS keeping their order
+    rows = np.array(rows, dtype=np.int64)
+    keys = rows * max(len(country_index), 1) + np.array(cols, dtype=np.int64)
+    unique_keys, first, entry = np.unique(keys, return_index=True, return_inverse=True)
+    by_first = np.argsort(first, kind='stable')
+    rank = np.empty(len(unique_keys), dtype=np.int64)
+    rank[by_first] = np.arange(len(unique_keys))
+    data = np.zeros(len(unique_keys), dtype=np.float64)
+    np.add.at(data, rank[entry], np.array(values, dtype=np.float64))
+    entry_rows = rows[first[by_first]]
+    order = np.argsort(entry_rows, kind='stable')
+    data = data[order]
+    indices = (unique_keys[by_first] % max(len(country_index), 1))[order]
+    indptr = np.zeros(len(asn_index) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(entry_rows, minlength=len(asn_index)), out=indptr[1:])
+
+    # Normalize every row to 100, summing like sum() over the row's values
+    values = data.tolist()
+    bounds = indptr.tolist()
+    totals = np.array([sum(values[start:end]) for start, end in zip(bounds[:-1], bounds[1:])])
+    row_totals = np.repeat(totals, np.diff(indptr))
+    data = np.where(row_totals > 0, data / np.where(row_totals > 0, row_totals, 1) * 100, data)
+
+    matrix = sp.csr_matrix((data, indices, indptr), shape=(len(asn_index), len(country_index)))
+    return {'asns': list(asn_index), 'countries': list(country_index), 'matrix': matrix}
+
+
+# CO2 intensity of every country keyed by ISO2, as in add_co2_intensity
+def country_co2_map(co2_data):
+    return {iso3_to_iso2(k): v['emissions_intensity_gco2_per_kwh'] for k, v in co2_data.items()}
+
+
+# Dense intensity vector aligned with the given countries; NaN where no intensity is known
+def intensity_vector(co2_map, countries):
+    return np.array([np.nan if co2_map.get(country) is None else co2_map[country] for country in countries],
+                    dtype=np.float64)
+
+
+# Presence-weighted average intensity of every AS over the countries with a known intensity.
+# intensities is a country vector or a country x scenario matrix; ASes without any known
+# country get NaN.
+def weighted_intensities(presence, intensities):
+    known = ~np.isnan(intensities)
+    weighted_sum = presence['matrix'] @ np.where(known, intensities, 0.0)
+    total_presence = presence['matrix'] @ known.astype(np.float64)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(total_presence > 0, weighted_sum / np.where(total_presence > 0, total_presence, 1), np.nan)
+
+
+# Same result as calculate_co2_intensity_per_as(add_co2_intensity(merge_datasets(...), co2_data))
+# without the None entries, computed on the sparse presence matrix
+def co2_intensity_per_as(maxmind_data, peeringdb_data, co2_data):
+    presence = presence_matrix(maxmind_data, peeringdb_data)
+    intensity = weighted_intensities(presence, intensity_vector(country_co2_map(co2_data), presence['countries']))
+    return {asn: value for asn, value in zip(presence['asns'], intensity.tolist()) if not np.isnan(value)}
+
 # Plot a CDF showing the greenness of ASes and determine the best threshold for green ASes
 def plot_threshold(output_url, as_co2_intensity):
     scores = [v for v in as_co2_intensity.values() if v is not None]
@@ -114,28 +201,30 @@ def plot_threshold(output_url, as_co2_intensity):
     plt.savefig(output_url)
     plt.close()
 
+# Sets the intensity attribute of the ASN registry in registry_dir, adding the ASes it lacks
+def store_intensities(registry_dir, co2_intensity_per_as):
+    asns = [int(asn) for asn in co2_intensity_per_as]
+    registry = update_registry(registry_dir, asns)
+    set_attribute(registry, 'intensity', asns, list(co2_intensity_per_as.values()))
+    save_registry(registry, registry_dir)
+
 if __name__ == '__main__':
     # Load datasets
     peeringdb_data = read_json('../geolocate/output/presence_per_AS_peeringdb_may_2025.json')
     maxmind_data = read_json('../geolocate/output/presence_per_AS_maxmind_may_2025.json')
     co2_per_iso3 = read_json("../green_web_foundation/gwf_average-intensities_last_updated_may_2025.json")
 
-    # Merge the datasets
-    normalized_data = merge_datasets(maxmind_data, peeringdb_data)
-
-    # Generate a new dataset enriched with CO2 intensity
-    augmented_data = add_co2_intensity(normalized_data, co2_per_iso3)
-
-    # Calculate CO2 intensity per AS
-    as_co2_intensity = calculate_co2_intensity_per_as(augmented_data)
-
-    # Exclude None values
-    filtered_dict = {k: v for k, v in as_co2_intensity.items() if v is not None}
+    # Merge the datasets and calculate the CO2 intensity per AS, excluding ASes without any
+    # known intensity (merge_datasets, add_co2_intensity and calculate_co2_intensity_per_as
+    # compute the same on nested dicts)
+    filtered_dict = co2_intensity_per_as(maxmind_data, peeringdb_data, co2_per_iso3)
 
     # Sort the filtered dictionary
     sorted_dict = dict(sorted(filtered_dict.items(), key=lambda item: item[1]))
 
     write_json("output/as2co2_intensity_may_2025.json", sorted_dict)
+    # Store the intensities in the snapshot's ASN registry, where the later stages read them
+    store_intensities('../registry/20250501', filtered_dict)
     
     # Plot the requested figures
     plot_threshold("output/threshold_green_ases_may_2025.png", sorted_dict)
\ No newline at end of file
@@ -1,11 +1,35 @@
 import pybgpstream
 import csv
-import pytricia
 import json
 from concurrent.futures import ProcessPoolExecutor
 import os
+import shutil
+import time
 from concurrent.futures import as_completed
 from tqdm import tqdm
+from bogon_index import read_bogons, build_bogon_index, save_bogon_index, load_bogon_index, validate_prefixes
+from rib_columnar import ROW_GROUP_SIZE, rib_table, open_rib_writer, merge_rib_files
+from path_dictionary import write_interned_rows, dictionary_file, merge_interned
+
+# RIS and RouteViews collectors that publish RIB dumps
+RIS_COLLECTORS = ['rrc00', 'rrc01', 'rrc03', 'rrc04', 'rrc05', 'rrc06', 'rrc07', 'rrc10', 'rrc11',
+                  'rrc12', 'rrc13', 'rrc14', 'rrc15', 'rrc16', 'rrc18', 'rrc19', 'rrc20', 'rrc21',
+                  'rrc22', 'rrc23', 'rrc24', 'rrc25', 'rrc26']
+ROUTEVIEWS_COLLECTORS = ['route-views2', 'route-views3', 'route-views4', 'route-views5', 'route-views6',
+                         'route-views.amsix', 'route-views.chicago', 'route-views.chile', 'route-views.eqix',
+                         'route-views.flix', 'route-views.gorex', 'route-views.isc', 'route-views.kixp',
+                         'route-views.jinx', 'route-views.linx', 'route-views.napafrica', 'route-views.nwax',
+                         'route-views.perth', 'route-views.peru', 'route-views.phoix', 'route-views.rio',
+                         'route-views.saopaulo', 'route-views.sfmix', 'route-views.sg', 'route-views.soxrs',
+                         'route-views.sydney', 'route-views.telxatl', 'route-views.uaeix', 'route-views.wide']
+COLLECTORS_PER_PROJECT = {'ris': RIS_COLLECTORS, 'routeviews': ROUTEVIEWS_COLLECTORS}
+
+# Number of RIB entries whose prefixes are validated together
+VALIDATION_BATCH = 65536
+
+# File extension of each output format
+OUTPUT_EXTENSIONS = {'full': '.csv', 'paths': '.csv', 'interned': '.csv', 'parquet': '.parquet'}
+
 
 def read_json(jsonfilename):
     with open(jsonfilename, 'r') as jsonfile:
@@ -16,30 +40,19 @@ def sanitize_filename(prefix):
     return prefix.replace('/', '_')
 
 
+# Original per-prefix check against PyTricia trees of the bogons, kept as the benchmark reference
 def create_bogons_trees(filename1, filename2):
+    import pytricia
+
     def populate_pytricia(filename, ipv6=False):
         pyt = pytricia.PyTricia(128) if ipv6 else pytricia.PyTricia()
-        with open(filename, 'r') as f:
-            reader = csv.reader(f)
-            next(reader), next(reader)
-            for row in reader:
-                pyt.insert(row[0], 'bogus')
+        for prefix in read_bogons(filename):
+            pyt.insert(prefix, 'bogus')
         return pyt
 
     return populate_pytricia(filename1), populate_pytricia(filename2, ipv6=True)
 
 
-def pytricia_to_dict(pytricia_obj):
-    return {key: pytricia_obj[key] for key in pytricia_obj.keys()}
-
-
-def dict_to_pytricia(data, ipv6=False):
-    pyt = pytricia.PyTricia(128) if ipv6 else pytricia.PyTricia()
-    for key, value in data.items():
-        pyt.insert(key, value)
-    return pyt
-
-
 def is_valid(prefix, bogons_pyt_v4, bogons_pyt_v6):
     if bogons_pyt_v4.has_key(prefix) or bogons_pyt_v6.has_key(prefix):
         return False
@@ -62,41 +75,228 @@ def has_cycle(seq):
     return len(seq) != len(set(seq))
 
 
-def collect_bgp_ribs(bogons_pyt_v4_dict, bogons_pyt_v6_dict, date):
-    # Reconstruct PyTricia objects inside the worker
-    bogons_pyt_v4 = dict_to_pytricia(bogons_pyt_v4_dict)
-    bogons_pyt_v6 = dict_to_pytricia(bogons_pyt_v6_dict, ipv6=True)
+# Opens the BGPStream of one (date, collector, project) task. When mrt_file is given, the
+# single-file data interface reads that local MRT dump instead, e.g. for offline benchmarks.
+def open_stream(date=None, collector=None, project='ris', record_type='ribs', mrt_file=None):
+    if mrt_file is not None:
+        stream = pybgpstream.BGPStream(data_interface="singlefile")
+        option = "rib-file" if record_type == 'ribs' else "upd-file"
+        stream.set_data_interface_option("singlefile", option, mrt_file)
+        return stream
+    return pybgpstream.BGPStream(from_time=f"{date} 00:00:00",
+                                 until_time=f"{date} 00:00:00 UTC",
+                                 collectors=[collector] if collector else [],
+                                 projects=[project], record_type=record_type)
+
+
+# Original extraction: formats every element as text, splits it again and checks every prefix
+# against the PyTricia trees one at a time, kept for benchmarking
+def iter_valid_rib_rows(stream, bogons_pyt_v4, bogons_pyt_v6):
+    for elem in stream:
+        row = str(elem).split('|')
+        if '{ ' in row:
+            continue
+        record_type, rec_type, _, _, _, _, _, peer_asn, _, prefix, _, as_path, *_ = row
+        if record_type == "rib" and rec_type == "R" and is_valid(prefix, bogons_pyt_v4, bogons_pyt_v6):
+            as_path_list = remove_prepending(as_path.split())
+            if not has_cycle(as_path_list) and len(as_path_list) > 1:
+                yield row
+
+
+# Keeps the entries of a batch whose prefix is valid and whose path is loop-free and longer than one AS
+def _filter_batch(batch, bogon_index):
+    valid = validate_prefixes([prefix for _, _, prefix, _ in batch], bogon_index)
+    for entry, ok in zip(batch, valid.tolist()):
+        if ok:
+            as_path_list = remove_prepending(entry[3].split())
+            if not has_cycle(as_path_list) and len(as_path_list) > 1:
+                yield entry
+
+
+# Fast extraction: reads type, peer ASN, prefix and AS path straight from the element and validates
+# the prefixes in batches. Yields (elem, peer_asn, prefix, as_path) for every valid RIB entry, in
+# stream order; paths with AS sets are dropped.
+def iter_valid_rib_elems(stream, bogon_index, batch_size=VALIDATION_BATCH):
+    batch = list()
+    for elem in stream:
+        if elem.type != "R":
+            continue
+        fields = elem.fields
+        as_path = fields.get('as-path', '')
+        if '{' in as_path:
+            continue
+        batch.append((elem, elem.peer_asn, fields['prefix'], as_path))
+        if len(batch) >= batch_size:
+            yield from _filter_batch(batch, bogon_index)
+            batch = list()
+    if batch:
+        yield from _filter_batch(batch, bogon_index)
+
+
+# Writes valid RIB entries to Parquet, one row group per ROW_GROUP_SIZE entries
+def write_rib_parquet(entries, output_file):
+    writer = open_rib_writer(output_file)
+    peer_asns, prefixes, as_paths = list(), list(), list()
+    for _, peer_asn, prefix, as_path in entries:
+        peer_asns.append(peer_asn)
+        prefixes.append(prefix)
+        as_paths.append(as_path)
+        if len(prefixes) >= ROW_GROUP_SIZE:
+            writer.write_table(rib_table(peer_asns, prefixes, as_paths))
+            peer_asns, prefixes, as_paths = list(), list(), list()
+    if prefixes:
+        writer.write_table(rib_table(peer_asns, prefixes, as_paths))
+    writer.close()
+
 
-    stream = pybgpstream.BGPStream(from_time=f"{date} 00:00:00",
-                                   until_time=f"{date} 00:00:00 UTC",
-                                   projects=['ris'], record_type="ribs")
+# Writes valid RIB entries as prefix|path_id rows plus the path dictionary they refer to
+def write_rib_interned(entries, rows_file, paths_file):
+    rows = ((prefix, as_path) for _, _, prefix, as_path in entries)
+    write_interned_rows(rows, rows_file, paths_file, batch_size=VALIDATION_BATCH)
 
-    output_file = "./ribs/" + date + "_ribs.csv"
 
-    with open(output_file, 'a+', newline='') as f:
-        writer = csv.writer(f, delimiter='|')
-        for elem in stream:
-            row = str(elem).split('|')
-            if '{ ' in row:
-                continue
-            record_type, rec_type, _, _, _, _, _, peer_asn, _, prefix, _, as_path, *_ = row
-            if record_type == "rib" and rec_type == "R" and is_valid(prefix, bogons_pyt_v4, bogons_pyt_v6):
-                as_path_list = remove_prepending(as_path.split())
-                if not has_cycle(as_path_list) and len(as_path_list) > 1:
-                    writer.writerow(row)
+# Collects the RIB of one (date, collector, project) task into output_file.
+# Rows are written to a temporary file that is renamed into place once the stream is exhausted,
+# so an interrupted or repeated run never leaves a partial or double-appended file behind.
+# output_format 'full' writes the complete pipe-separated element, 'paths' only prefix|as_path
+# (the format CalculateN/extract_prefix_paths.py produces), 'interned' prefix|path_id with each
+# distinct path stored once in <output_file>.paths.npz (see path_dictionary.py) and 'parquet'
+# typed columns with prepending removed (see rib_columnar.RIB_SCHEMA).
+def collect_bgp_ribs(bogon_index_dir, date, collector=None, project='ris',
+                     output_file=None, output_format='full', mrt_file=None):
+    # Map the shared bogon index inside the worker
+    bogon_index = load_bogon_index(bogon_index_dir)
+
+    stream = open_stream(date, collector, project, mrt_file=mrt_file)
+
+    if output_file is None:
+        output_file = "./ribs/" + date + "_ribs" + OUTPUT_EXTENSIONS[output_format]
+    tmp_file = output_file + '.tmp'
+
+    entries = iter_valid_rib_elems(stream, bogon_index)
+    if output_format == 'parquet':
+        write_rib_parquet(entries, tmp_file)
+    elif output_format == 'interned':
+        write_rib_interned(entries, tmp_file, dictionary_file(output_file))
+    else:
+        with open(tmp_file, 'w', newline='') as f:
+            writer = csv.writer(f, delimiter='|')
+            for elem, peer_asn, prefix, as_path in entries:
+                if output_format == 'paths':
+                    writer.writerow([prefix, as_path])
+                else:
+                    # Only the rows we keep pay for the text formatting
+                    writer.writerow(str(elem).split('|'))
+    os.replace(tmp_file, output_file)
+    return output_file
+
+
+# Times both extraction paths over the same local MRT RIB dump: the original one (str(elem)
+# splitting, PyTricia checks) and the fast one (typed fields, batched checks on the bogon index)
+def benchmark_extraction(mrt_file, bogon_index_dir, bogon_file_v4, bogon_file_v6):
+    bogons_pyt_v4, bogons_pyt_v6 = create_bogons_trees(bogon_file_v4, bogon_file_v6)
+    bogon_index = load_bogon_index(bogon_index_dir)
+    extractions = (('str_split', lambda stream: iter_valid_rib_rows(stream, bogons_pyt_v4, bogons_pyt_v6)),
+                   ('typed_fields', lambda stream: iter_valid_rib_elems(stream, bogon_index)))
+    timings = dict()
+    for name, extract in extractions:
+        start = time.perf_counter()
+        kept = sum(1 for _ in extract(open_stream(mrt_file=mrt_file)))
+        timings[name] = time.perf_counter() - start
+        print(f"{name}: {kept} valid entries in {timings[name]:.2f}s")
+    return timings
+
+
+# Returns the path of the shard that holds the RIB of one (date, collector, project) task
+def shard_path(output_dir, task, output_format='full'):
+    date, collector, project = task
+    return os.path.join(output_dir, date, f"{project}_{collector}_ribs" + OUTPUT_EXTENSIONS[output_format])
+
+
+# Splits the collection into one task per (date, collector, project)
+def build_tasks(dates, projects=('ris', 'routeviews')):
+    return [(date, collector, project)
+            for date in dates
+            for project in projects
+            for collector in COLLECTORS_PER_PROJECT[project]]
+
+
+# Worker entry point: collects a single task into its own shard
+def collect_task(task, bogon_index_dir, output_dir, output_format='full'):
+    date, collector, project = task
+    output_file = shard_path(output_dir, task, output_format)
+    return collect_bgp_ribs(bogon_index_dir, date, collector, project, output_file, output_format)
+
+
+# Runs all tasks on a process pool; shards that already exist from a previous run are skipped
+def run_collection(tasks, bogon_index_dir, output_dir='./ribs', max_workers=None, output_format='full'):
+    shards = dict()
+    pending = list()
+    for task in tasks:
+        shards[task] = shard_path(output_dir, task, output_format)
+        if os.path.exists(shards[task]):
+            continue
+        os.makedirs(os.path.dirname(shards[task]), exist_ok=True)
+        pending.append(task)
+
+    failed = list()
+    with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count()) as executor:
+        futures = {executor.submit(collect_task, task, bogon_index_dir, output_dir, output_format): task
+                   for task in pending}
+        for future in tqdm(as_completed(futures), total=len(futures), desc='Collecting RIBs'):
+            task = futures[future]
+            try:
+                future.result()
+            except Exception as e:
+                print(f"Task {task} failed: {e}")
+                failed.append(task)
+                del shards[task]
+    return shards, failed
+
+
+# Concatenates the shards of each date into <output_dir>/<date>_ribs.<csv|parquet>, atomically
+def merge_shards(shards, output_dir='./ribs', output_format='full'):
+    shards_per_date = dict()
+    for (date, _, _), shard in sorted(shards.items()):
+        shards_per_date.setdefault(date, list()).append(shard)
+
+    merged = dict()
+    for date, date_shards in shards_per_date.items():
+        output_file = os.path.join(output_dir, date + "_ribs" + OUTPUT_EXTENSIONS[output_format])
+        tmp_file = output_file + '.tmp'
+        if output_format == 'interned':
+            # Path ids are per shard, so the rows are re-numbered into one dictionary
+            merge_interned(date_shards, output_file)
+            merged[date] = output_file
+            continue
+        if output_format == 'parquet':
+            merge_rib_files(date_shards, tmp_file)
+        else:
+            with open(tmp_file, 'wb') as out:
+                for shard in date_shards:
+                    with open(shard, 'rb') as f:
+                        shutil.copyfileobj(f, out, 1 << 20)
+        os.replace(tmp_file, output_file)
+        merged[date] = output_file
+    return merged
 
 
 if __name__ == "__main__":
-    # We hold two pytricia trees with bogus IPv4 and IPv6 for filtering
+    # We build the bogon index for IPv4 and IPv6 once; workers memory-map it read-only
     filename1 = '../cymru/fullbogons-ipv4.txt'
     filename2 = '../cymru/fullbogons-ipv6.txt'
-    bogons_pyt_v4, bogons_pyt_v6 = create_bogons_trees(filename1, filename2)
-    # Convert PyTricia objects to dictionaries for serialization
-    bogons_pyt_v4_dict = pytricia_to_dict(bogons_pyt_v4)
-    bogons_pyt_v6_dict = pytricia_to_dict(bogons_pyt_v6)
-
-    # Collection dates for snapshots
-    date = "2025-05-01"
-    collect_bgp_ribs(bogons_pyt_v4_dict, bogons_pyt_v6_dict, date)
+    bogon_index_dir = './ribs/bogon_index'
+    save_bogon_index(build_bogon_index(filename1, filename2), bogon_index_dir)
+
+    # Collection dates for snapshots, one task per (date, collector, project)
+    dates = ["2025-05-01"]
+    tasks = build_tasks(dates, projects=('ris', 'routeviews'))
+    # 'full' keeps the pipe-separated text rows, 'interned' and 'parquet' are compact inputs for CalculateN
+    output_format = 'full'
+    shards, failed = run_collection(tasks, bogon_index_dir, max_workers=32, output_format=output_format)
+    if failed:
+        print(f"{len(failed)} tasks failed, rerun to retry them before merging: {failed}")
+    else:
+        merge_shards(shards, output_format=output_format)
     
             
@@ -0,0 +1,61 @@
+import csv
+import os
+import numpy as np
+from prefix_arrays import parse_prefixes, v4_keys, v6_keys, isin_sorted
+
+# Indexes loaded by this process, keyed by directory, so every worker maps them only once
+_loaded_indexes = dict()
+
+
+# Reads the prefixes of a Team Cymru fullbogons file (two header lines, one prefix per row)
+def read_bogons(filename):
+    with open(filename, 'r') as f:
+        reader = csv.reader(f)
+        next(reader), next(reader)
+        return [row[0] for row in reader if row]
+
+
+# Builds the bogon index: sorted exact-match keys for IPv4 and IPv6 bogon prefixes
+def build_bogon_index(filename_v4, filename_v6):
+    parsed = parse_prefixes(read_bogons(filename_v4) + read_bogons(filename_v6))
+    ok_v4 = parsed['ok'] & ~parsed['v6']
+    ok_v6 = parsed['ok'] & parsed['v6']
+    return {
+        'v4_keys': np.unique(v4_keys(parsed['lo'][ok_v4], parsed['len'][ok_v4])),
+        'v6_keys': np.unique(v6_keys(parsed['hi'][ok_v6], parsed['lo'][ok_v6], parsed['len'][ok_v6])),
+    }
+
+
+# Writes the index as plain .npy files so workers can memory-map them read-only
+def save_bogon_index(index, directory):
+    os.makedirs(directory, exist_ok=True)
+    for name, keys in index.items():
+        np.save(os.path.join(directory, name + '.npy'), keys)
+
+
+# Memory-maps a saved index; the pages are shared between all processes through the page cache
+def load_bogon_index(directory):
+    if directory not in _loaded_indexes:
+        _loaded_indexes[directory] = {
+            name: np.load(os.path.join(directory, name + '.npy'), mmap_mode='r')
+            for name in ('v4_keys', 'v6_keys')
+        }
+    return _loaded_indexes[directory]
+
+
+# Validates a batch of prefixes at once. A prefix is valid when it parses, is not itself a
+# bogon (exact match), and is at most a /64 for IPv6 or between a /8 and a /24 for IPv4.
+def validate_prefixes(prefixes, index):
+    parsed = parse_prefixes(prefixes)
+    v6, length = parsed['v6'], parsed['len']
+    valid = parsed['ok'] & np.where(v6, length <= 64, (length >= 8) & (length <= 24))
+
+    is_v4 = valid & ~v6
+    if is_v4.any():
+        bogus = isin_sorted(index['v4_keys'], v4_keys(parsed['lo'][is_v4], length[is_v4]))
+        valid[np.flatnonzero(is_v4)[bogus]] = False
+    is_v6 = valid & v6
+    if is_v6.any():
+        bogus = isin_sorted(index['v6_keys'], v6_keys(parsed['hi'][is_v6], parsed['lo'][is_v6], length[is_v6]))
+        valid[np.flatnonzero(is_v6)[bogus]] = False
+    return valid
@@ -0,0 +1,108 @@
+import csv
+import os
+import numpy as np
+from rib_columnar import parse_as_paths
+
+# Dictionary encoding of AS paths. Every distinct path gets an integer id, in order of first
+# appearance, and its hops are stored once in a CSR-style buffer: the hops of path i are
+# hops[offsets[i]:offsets[i + 1]]. Rows then carry only the path id ("prefix|path_id"), and the
+# dictionary of a rows file is saved next to it as <rows file>.paths.npz.
+
+
+# An empty dictionary: ids maps path strings to ids, chunks/lengths collect the hops of new paths
+def new_path_dictionary():
+    return {'ids': dict(), 'chunks': list(), 'lengths': list()}
+
+
+# Returns the ids of the given space-separated paths, adding the paths not seen before
+def intern_paths(path_dictionary, as_paths):
+    ids = path_dictionary['ids']
+    new_paths = list()
+    path_ids = list()
+    for as_path in as_paths:
+        path_id = ids.get(as_path)
+        if path_id is None:
+            path_id = ids[as_path] = len(ids)
+            new_paths.append(as_path)
+        path_ids.append(path_id)
+    if new_paths:
+        hops, offsets = parse_as_paths(new_paths)
+        path_dictionary['chunks'].append(hops)
+        path_dictionary['lengths'].append(np.diff(offsets))
+    return path_ids
+
+
+# Returns the CSR buffer (hops, offsets) of a dictionary
+def dictionary_arrays(path_dictionary):
+    if not path_dictionary['chunks']:
+        return np.zeros(0, dtype=np.uint32), np.zeros(1, dtype=np.int64)
+    hops = np.concatenate(path_dictionary['chunks'])
+    lengths = np.concatenate(path_dictionary['lengths'])
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    # Keep a single chunk so later calls do not concatenate again
+    path_dictionary['chunks'], path_dictionary['lengths'] = [hops], [lengths]
+    return hops, offsets
+
+
+# Name of the dictionary that belongs to a rows file
+def dictionary_file(rows_file):
+    return rows_file + '.paths.npz'
+
+
+# Writes the CSR buffer of a dictionary, atomically
+def save_path_dictionary(path_dictionary, filename):
+    hops, offsets = dictionary_arrays(path_dictionary)
+    with open(filename + '.tmp', 'wb') as f:
+        np.savez(f, hops=hops, offsets=offsets)
+    os.replace(filename + '.tmp', filename)
+
+
+# Loads the CSR buffer (hops, offsets) of a saved dictionary
+def load_path_dictionary(filename):
+    with np.load(filename) as data:
+        return data['hops'], data['offsets']
+
+
+# Formats the paths of a CSR buffer back into space-separated strings
+def path_strings(hops, offsets):
+    hops = hops.tolist()
+    return [' '.join(map(str, hops[start:end])) for start, end in zip(offsets[:-1].tolist(), offsets[1:].tolist())]
+
+
+# Reads the path id column of a prefix|path_id rows file
+def read_path_ids(rows_file):
+    with open(rows_file, 'r') as f:
+        return np.array([row[1] for row in csv.reader(f, delimiter='|') if len(row) >= 2], dtype=np.uint32)
+
+
+# Writes (prefix, as_path) rows as prefix|path_id rows plus the dictionary of their paths, interning
+# batch_size rows at a time
+def write_interned_rows(rows, rows_file, paths_file, batch_size=1 << 16):
+    path_dictionary = new_path_dictionary()
+    with open(rows_file, 'w', newline='') as f:
+        writer = csv.writer(f, delimiter='|')
+        prefixes, as_paths = list(), list()
+        for prefix, as_path in rows:
+            prefixes.append(prefix)
+            as_paths.append(as_path)
+            if len(prefixes) >= batch_size:
+                writer.writerows(zip(prefixes, intern_paths(path_dictionary, as_paths)))
+                prefixes, as_paths = list(), list()
+        if prefixes:
+            writer.writerows(zip(prefixes, intern_paths(path_dictionary, as_paths)))
+    save_path_dictionary(path_dictionary, paths_file)
+
+
+# Concatenates prefix|path_id rows files, re-numbering their paths into one shared dictionary
+def merge_interned(rows_files, output_file):
+    merged = new_path_dictionary()
+    with open(output_file + '.tmp', 'w', newline='') as out:
+        writer = csv.writer(out, delimiter='|')
+        for rows_file in rows_files:
+            remap = intern_paths(merged, path_strings(*load_path_dictionary(dictionary_file(rows_file))))
+            with open(rows_file, 'r') as f:
+                for row in csv.reader(f, delimiter='|'):
+                    writer.writerow([row[0], remap[int(row[1])]])
+    save_path_dictionary(merged, dictionary_file(output_file))
+    os.replace(output_file + '.tmp', output_file)
@@ -0,0 +1,97 @@
+import socket
+import numpy as np
+
+MASK_64 = (1 << 64) - 1
+
+# Structured layout of an IPv6 lookup key. Big-endian fields make the byte order of the
+# 17-byte view match the numeric order of (network, length), so keys sort and searchsorted
+# correctly as fixed-width byte strings.
+V6_KEY_DTYPE = np.dtype([('hi', '>u8'), ('lo', '>u8'), ('len', 'u1')])
+
+
+# Parses a single "address/length" string into (is_v6, network, length) with host bits cleared
+def parse_prefix(prefix):
+    address, _, length = prefix.partition('/')
+    if ':' in address:
+        is_v6, bits = True, 128
+        value = int.from_bytes(socket.inet_pton(socket.AF_INET6, address), 'big')
+    else:
+        is_v6, bits = False, 32
+        value = int.from_bytes(socket.inet_pton(socket.AF_INET, address), 'big')
+    length = int(length) if length else bits
+    if not 0 <= length <= bits:
+        raise ValueError(f"invalid prefix length in {prefix}")
+    value &= ~((1 << (bits - length)) - 1)
+    return is_v6, value, length
+
+
+# Parses a batch of prefix strings into aligned arrays.
+# Returns a dict with 'ok' (parsed), 'v6' (family), 'hi'/'lo' (upper/lower 64 bits of the
+# network, IPv4 networks live in 'lo') and 'len'. Malformed prefixes get ok=False.
+def parse_prefixes(prefixes):
+    count = len(prefixes)
+    ok = np.zeros(count, dtype=bool)
+    v6 = np.zeros(count, dtype=bool)
+    hi = np.zeros(count, dtype=np.uint64)
+    lo = np.zeros(count, dtype=np.uint64)
+    length = np.zeros(count, dtype=np.uint8)
+    for i, prefix in enumerate(prefixes):
+        try:
+            is_v6, value, plen = parse_prefix(prefix)
+        except (ValueError, OSError):
+            continue
+        ok[i] = True
+        v6[i] = is_v6
+        hi[i] = value >> 64
+        lo[i] = value & MASK_64
+        length[i] = plen
+    return {'ok': ok, 'v6': v6, 'hi': hi, 'lo': lo, 'len': length}
+
+
+# Exact-match keys for IPv4 prefixes: network << 8 | length
+def v4_keys(lo, length):
+    return (lo.astype(np.uint64) << np.uint64(8)) | length.astype(np.uint64)
+
+
+# Exact-match keys for IPv6 prefixes: 17-byte strings ordered like (network, length)
+def v6_keys(hi, lo, length):
+    keys = np.empty(len(hi), dtype=V6_KEY_DTYPE)
+    keys['hi'] = hi
+    keys['lo'] = lo
+    keys['len'] = length
+    return keys.view('S17').ravel()
+
+
+# Tests every query key for membership in a sorted key array
+def isin_sorted(sorted_keys, query_keys):
+    if len(sorted_keys) == 0 or len(query_keys) == 0:
+        return np.zeros(len(query_keys), dtype=bool)
+    idx = np.searchsorted(sorted_keys, query_keys)
+    idx[idx == len(sorted_keys)] = 0
+    return sorted_keys[idx] == query_keys
+
+
+# Packs networks into 16-byte big-endian addresses (IPv4 networks occupy the last 4 bytes)
+def pack_addresses(hi, lo):
+    packed = np.empty(len(hi), dtype=[('hi', '>u8'), ('lo', '>u8')])
+    packed['hi'] = hi
+    packed['lo'] = lo
+    return packed.view('S16').ravel()
+
+
+# Splits 16-byte big-endian addresses back into their upper and lower 64 bits
+def unpack_addresses(packed):
+    words = np.ascontiguousarray(packed, dtype='S16').view('>u8').reshape(-1, 2)
+    return words[:, 0].astype(np.uint64), words[:, 1].astype(np.uint64)
+
+
+# Formats networks back into "address/length" strings
+def format_prefixes(v6, hi, lo, length):
+    prefixes = list()
+    for is_v6, h, l, plen in zip(v6.tolist(), hi.tolist(), lo.tolist(), length.tolist()):
+        if is_v6:
+            address = socket.inet_ntop(socket.AF_INET6, ((h << 64) | l).to_bytes(16, 'big'))
+        else:
+            address = socket.inet_ntop(socket.AF_INET, l.to_bytes(4, 'big'))
+        prefixes.append(f"{address}/{plen}")
+    return prefixes
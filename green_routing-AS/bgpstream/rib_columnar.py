@@ -0,0 +1,100 @@
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+from prefix_arrays import parse_prefixes, pack_addresses, unpack_addresses, format_prefixes
+
+# Columnar layout of collected RIB entries. Prefixes are stored as address family, packed
+# 16-byte network (IPv4 in the last 4 bytes) and length; AS paths with prepending removed.
+RIB_SCHEMA = pa.schema([
+    ('peer_asn', pa.uint32()),
+    ('af', pa.uint8()),
+    ('prefix_addr', pa.binary(16)),
+    ('prefix_len', pa.uint8()),
+    ('as_path', pa.list_(pa.uint32())),
+])
+
+# Rows per Parquet row group
+ROW_GROUP_SIZE = 1 << 20
+
+
+# Parses space-separated AS paths into one flat uint32 array plus per-path offsets
+def parse_as_paths(as_paths):
+    tokens = [path.split() for path in as_paths]
+    lengths = np.fromiter((len(hops) for hops in tokens), dtype=np.int64, count=len(tokens))
+    offsets = np.zeros(len(tokens) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    hops = np.array([hop for path in tokens for hop in path], dtype=np.uint32)
+    return hops, offsets
+
+
+# Drops consecutive repetitions of an AS inside each path (AS path prepending)
+def remove_prepending_flat(hops, offsets):
+    keep = np.ones(len(hops), dtype=bool)
+    keep[1:] = hops[1:] != hops[:-1]
+    keep[offsets[:-1][offsets[:-1] < len(hops)]] = True
+    kept = np.concatenate(([0], np.cumsum(keep)))
+    return hops[keep], kept[offsets]
+
+
+# Builds a Parquet-ready table from parallel lists of peer ASNs, prefixes and AS path strings
+def rib_table(peer_asns, prefixes, as_paths):
+    parsed = parse_prefixes(prefixes)
+    packed = pack_addresses(parsed['hi'], parsed['lo'])
+    hops, offsets = remove_prepending_flat(*parse_as_paths(as_paths))
+    return pa.Table.from_arrays([
+        pa.array(np.asarray(peer_asns, dtype=np.uint32)),
+        pa.array(np.where(parsed['v6'], 6, 4).astype(np.uint8)),
+        pa.FixedSizeBinaryArray.from_buffers(pa.binary(16), len(packed), [None, pa.py_buffer(packed.tobytes())]),
+        pa.array(parsed['len']),
+        pa.ListArray.from_arrays(pa.array(offsets.astype(np.int32)), pa.array(hops)),
+    ], schema=RIB_SCHEMA)
+
+
+# Opens a zstd-compressed Parquet writer for RIB entries
+def open_rib_writer(path, schema=RIB_SCHEMA):
+    return pq.ParquetWriter(path, schema, compression='zstd')
+
+
+# Iterates over record batches of a RIB Parquet file, reading only the requested columns
+def iter_rib_batches(path, columns=None, batch_size=ROW_GROUP_SIZE):
+    parquet_file = pq.ParquetFile(path)
+    yield from parquet_file.iter_batches(batch_size=batch_size, columns=columns)
+
+
+# Returns the prefixes of a batch (needs af, prefix_addr and prefix_len) in the array layout of
+# prefix_arrays.parse_prefixes
+def parsed_prefixes(batch):
+    addresses = batch.column('prefix_addr')
+    packed = np.frombuffer(addresses.buffers()[1], dtype='S16', count=len(addresses), offset=addresses.offset * 16)
+    hi, lo = unpack_addresses(packed)
+    return {'ok': np.ones(len(batch), dtype=bool), 'v6': batch.column('af').to_numpy() == 6,
+            'hi': hi, 'lo': lo, 'len': batch.column('prefix_len').to_numpy()}
+
+
+# Returns the prefixes of a batch as "address/length" strings
+def prefix_strings(batch):
+    parsed = parsed_prefixes(batch)
+    return format_prefixes(parsed['v6'], parsed['hi'], parsed['lo'], parsed['len'])
+
+
+# Returns the AS paths of a batch as space-separated strings
+def path_strings(batch):
+    return [' '.join(map(str, path)) for path in batch.column('as_path').to_pylist()]
+
+
+# Returns the AS paths of a batch as a flat uint32 hop array plus per-path offsets
+def path_arrays(batch):
+    as_paths = batch.column('as_path')
+    offsets = as_paths.offsets.to_numpy().astype(np.int64)
+    hops = as_paths.values.to_numpy()
+    return hops[offsets[0]:offsets[-1]], offsets - offsets[0]
+
+
+# Concatenates RIB Parquet files row group by row group, without decoding the whole files
+def merge_rib_files(input_files, output_file):
+    writer = open_rib_writer(output_file)
+    for input_file in input_files:
+        parquet_file = pq.ParquetFile(input_file)
+        for i in range(parquet_file.num_row_groups):
+            writer.write_table(parquet_file.read_row_group(i))
+    writer.close()
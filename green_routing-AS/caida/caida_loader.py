@@ -0,0 +1,170 @@
+import bz2
+import csv
+import gzip
+import os
+import shutil
+import numpy as np
+
+# Shared loader for the CAIDA datasets (as-rel2, ppdc-ases, as-org2info).
+# Files are streamed line by line (plain, .bz2 or .gz) and parsed into numpy arrays, which are
+# cached as .npy files in a directory named after the dataset file, its size and its mtime.
+# Later loads memory-map the cache instead of parsing again. ASNs are stored as uint32 (32-bit
+# ASNs do not fit int32); strings are stored as one UTF-8 buffer plus offsets, the i-th string
+# being blob[offsets[i]:offsets[i + 1]].
+
+# Bump when the layout of a cache changes, so stale caches are not read
+CACHE_VERSION = 1
+
+
+# Opens a dataset file for reading text, decompressing on the fly
+def open_text(filename):
+    if filename.endswith('.bz2'):
+        return bz2.open(filename, 'rt', encoding='utf-8', newline='')
+    if filename.endswith('.gz'):
+        return gzip.open(filename, 'rt', encoding='utf-8', newline='')
+    return open(filename, 'r', encoding='utf-8', newline='')
+
+
+# Size and modification time of a file, which identify its content without reading it
+def file_signature(filename):
+    stat = os.stat(filename)
+    return f"{stat.st_size}-{stat.st_mtime_ns}"
+
+
+# Packs strings into (blob, offsets) arrays
+def pack_strings(strings):
+    encoded = [s.encode('utf-8') for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(s) for s in encoded], out=offsets[1:])
+    return np.frombuffer(b''.join(encoded), dtype=np.uint8), offsets
+
+
+# Unpacks (blob, offsets) arrays back into a list of strings
+def unpack_strings(blob, offsets):
+    data = np.asarray(blob).tobytes()
+    bounds = np.asarray(offsets).tolist()
+    return [data[start:end].decode('utf-8') for start, end in zip(bounds[:-1], bounds[1:])]
+
+
+# Returns the arrays parse(filename) builds, from the cache if there is one for this content
+def cached_arrays(filename, kind, parse, cache_dir=None):
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(os.path.abspath(filename)), 'cache')
+    path = os.path.join(cache_dir, f"{os.path.basename(filename)}.{kind}.v{CACHE_VERSION}.{file_signature(filename)}")
+    if os.path.isdir(path):
+        return {name[:-4]: np.load(os.path.join(path, name), mmap_mode='r')
+                for name in os.listdir(path) if name.endswith('.npy')}
+
+    arrays = parse(filename)
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    os.makedirs(tmp_path, exist_ok=True)
+    for name, array in arrays.items():
+        np.save(os.path.join(tmp_path, name + '.npy'), array)
+    try:
+        os.rename(tmp_path, path)
+    except OSError:
+        shutil.rmtree(tmp_path)  # another process cached it first
+    return arrays
+
+
+# Parses as-rel2 ("as1|as2|rel|source" per line) into aligned as1, as2 and rel arrays
+def parse_as_rel(filename):
+    as1, as2, rel = list(), list(), list()
+    with open_text(filename) as f:
+        for line in f:
+            if line.startswith('#') or not line.strip():
+                continue
+            parts = line.split('|')
+            as1.append(int(parts[0]))
+            as2.append(int(parts[1]))
+            rel.append(int(parts[2]))
+    return {'as1': np.array(as1, dtype=np.uint32), 'as2': np.array(as2, dtype=np.uint32),
+            'rel': np.array(rel, dtype=np.int8)}
+
+
+# Parses ppdc-ases ("root member member ..." per line) into a CSR layout: the members of line i
+# are members[offsets[i]:offsets[i + 1]]
+def parse_ppdc(filename):
+    roots, members, lengths = list(), list(), list()
+    with open_text(filename) as f:
+        for line in f:
+            if line.startswith('#'):
+                continue
+            parts = line.split()
+            if not parts:
+                continue
+            roots.append(int(parts[0]))
+            members.extend(map(int, parts[1:]))
+            lengths.append(len(parts) - 1)
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    return {'roots': np.array(roots, dtype=np.uint32), 'offsets': offsets,
+            'members': np.array(members, dtype=np.uint32)}
+
+
+# Parses as-org2info into its two tables:
+#   organizations, org_id|changed|name|country|source -> org_id, org_name, org_country
+#   ASes, aut|changed|aut_name|org_id|opaque_id|source -> aut_asn, aut_name, aut_org_id
+# Rows are split like csv.reader(delimiter='|'), as the scripts reading the file always did.
+def parse_as_org(filename):
+    org_id, org_name, org_country = list(), list(), list()
+    aut_asn, aut_name, aut_org_id = list(), list(), list()
+    with open_text(filename) as f:
+        for row in csv.reader(f, delimiter='|'):
+            if not row or not row[0] or row[0][0] == '#':
+                continue
+            if len(row) == 5:
+                org_id.append(row[0])
+                org_name.append(row[2])
+                org_country.append(row[3])
+            elif len(row) == 6:
+                aut_asn.append(int(row[0]))
+                aut_name.append(row[2])
+                aut_org_id.append(row[3])
+    arrays = {'aut_asn': np.array(aut_asn, dtype=np.uint32)}
+    for name, strings in (('org_id', org_id), ('org_name', org_name), ('org_country', org_country),
+                          ('aut_name', aut_name), ('aut_org_id', aut_org_id)):
+        arrays[name + '_blob'], arrays[name + '_offsets'] = pack_strings(strings)
+    return arrays
+
+
+def load_as_rel(filename, cache_dir=None):
+    return cached_arrays(filename, 'as-rel2', parse_as_rel, cache_dir)
+
+
+def load_ppdc(filename, cache_dir=None):
+    return cached_arrays(filename, 'ppdc', parse_ppdc, cache_dir)
+
+
+def load_as_org(filename, cache_dir=None):
+    return cached_arrays(filename, 'as-org2info', parse_as_org, cache_dir)
+
+
+# The ASes of as-rel2 in order of first appearance (as1 before as2 on every line)
+def rel_ases(as_rel):
+    interleaved = np.column_stack((as_rel['as1'], as_rel['as2'])).ravel()
+    ases, first = np.unique(interleaved, return_index=True)
+    return ases[np.argsort(first)]
+
+
+# The customer cones of ppdc-ases as {root: list of distinct members}, ASNs as strings.
+# Roots keep their order of first appearance; members are sorted.
+def cone_dict(ppdc):
+    roots = np.asarray(ppdc['roots'])
+    offsets = np.asarray(ppdc['offsets'])
+    root_of_member = np.repeat(roots, np.diff(offsets)).astype(np.uint64)
+    pairs = np.sort((root_of_member << np.uint64(32)) | np.asarray(ppdc['members']).astype(np.uint64))
+    pairs = pairs[np.concatenate(([True], pairs[1:] != pairs[:-1]))]
+    pair_roots = pairs >> np.uint64(32)
+    members = list(map(str, (pairs & np.uint64(0xFFFFFFFF)).astype(np.uint32).tolist()))
+    ordered_roots, first = np.unique(roots, return_index=True)
+    starts = np.searchsorted(pair_roots, ordered_roots, side='left').tolist()
+    ends = np.searchsorted(pair_roots, ordered_roots, side='right').tolist()
+    cones = {root: members[start:end] for root, start, end in zip(ordered_roots.tolist(), starts, ends)}
+    return {str(root): cones[root] for root in ordered_roots[np.argsort(first)].tolist()}
+
+
+# The string columns of a parsed as-org2info table
+def org_strings(as_org, name):
+    return unpack_strings(as_org[name + '_blob'], as_org[name + '_offsets'])
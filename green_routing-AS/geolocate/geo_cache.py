@@ -0,0 +1,78 @@
+import json
+import sqlite3
+import time
+
+# Persistent cache of per-AS geolocation results, in SQLite.
+# Entries are keyed by (asn, version), where version names the data snapshot a run is for
+# (e.g. '2025-05'), and carry the time they were fetched. A run stores every result as soon as
+# it arrives, so a restarted run only queries the ASes it has no entry for. In refresh mode,
+# entries fetched within the TTL under any version are reused for the new version, so only the
+# stale ASes (including stale entries of the version itself) are queried again.
+
+
+# Opens (and creates if needed) the cache
+def open_cache(filename):
+    conn = sqlite3.connect(filename)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("""CREATE TABLE IF NOT EXISTS geolocation (
+                        asn TEXT NOT NULL,
+                        version TEXT NOT NULL,
+                        fetched_at REAL NOT NULL,
+                        coverage TEXT NOT NULL,
+                        PRIMARY KEY (asn, version))""")
+    conn.execute("CREATE INDEX IF NOT EXISTS geolocation_fetched ON geolocation (asn, fetched_at)")
+    conn.commit()
+    return conn
+
+
+# Stores the coverage of one AS, replacing any previous entry for the same version
+def store_coverage(conn, asn, version, coverage, fetched_at=None):
+    if fetched_at is None:
+        fetched_at = time.time()
+    conn.execute("INSERT OR REPLACE INTO geolocation (asn, version, fetched_at, coverage) VALUES (?, ?, ?, ?)",
+                 (str(asn), version, fetched_at, json.dumps(coverage)))
+    conn.commit()
+
+
+# Returns the set of ASNs that have an entry for the version; with a ttl, only the entries fetched
+# less than ttl seconds ago count, so stale entries of the version are queried again
+def cached_ases(conn, version, ttl=None):
+    if ttl is None:
+        return {row[0] for row in conn.execute("SELECT asn FROM geolocation WHERE version = ?", (version,))}
+    return {row[0] for row in conn.execute("SELECT asn FROM geolocation WHERE version = ? AND fetched_at >= ?",
+                                           (version, time.time() - ttl))}
+
+
+# Copies into the version the most recent entry of every AS that was fetched less than ttl
+# seconds ago under another version, replacing the AS's entry of the version when it is older.
+# Returns the number of entries reused.
+def reuse_fresh(conn, version, ttl):
+    cursor = conn.execute("""INSERT INTO geolocation (asn, version, fetched_at, coverage)
+                             SELECT asn, ?, fetched_at, coverage FROM geolocation AS g
+                             WHERE version != ? AND fetched_at >= ?
+                               AND fetched_at = (SELECT MAX(fetched_at) FROM geolocation
+                                                 WHERE asn = g.asn AND version != ?)
+                             ON CONFLICT (asn, version) DO UPDATE
+                               SET fetched_at = excluded.fetched_at, coverage = excluded.coverage
+                               WHERE excluded.fetched_at > geolocation.fetched_at""",
+                          (version, version, time.time() - ttl, version))
+    conn.commit()
+    return cursor.rowcount
+
+
+# Removes entries fetched more than ttl seconds ago, except those of the versions to keep
+def evict_stale(conn, ttl, keep_versions=()):
+    placeholders = ','.join('?' * len(keep_versions))
+    query = "DELETE FROM geolocation WHERE fetched_at < ?"
+    if keep_versions:
+        query += f" AND version NOT IN ({placeholders})"
+    cursor = conn.execute(query, (time.time() - ttl, *keep_versions))
+    conn.commit()
+    return cursor.rowcount
+
+
+# Returns {asn: coverage} of all the entries of a version
+def load_coverage(conn, version):
+    return {asn: json.loads(coverage)
+            for asn, coverage in conn.execute("SELECT asn, coverage FROM geolocation WHERE version = ?", (version,))}
@@ -0,0 +1,220 @@
+import csv
+import os
+import sys
+import json
+import socket
+import numpy as np
+
+# Prefix parsing and packed addresses are shared with the collector
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'bgpstream'))
+from prefix_arrays import MASK_64, parse_prefixes, pack_addresses
+
+# Offline alternative to geolocate_ases_via_prefix.py: instead of asking RIPEstat for every AS,
+# every prefix of the RouteViews pfx2as files is range-joined against a local IP-to-country
+# database. Addresses are handled as (hi, lo) 64-bit halves, and as 16-byte big-endian strings
+# (IPv4 in the last 4 bytes) when they need to be sorted or searched. The geo database is a
+# sorted array of non-overlapping [start, end] ranges, so the ranges overlapping a prefix are
+# found with two np.searchsorted calls. As in RIPEstat's maxmind-geo-lite-announced-by-as, the
+# coverage of a country is the percentage of each prefix it covers, summed over the prefixes of
+# the AS; prefixes with several origins (MOAS) count for each of them.
+
+# Prefixes range-joined together
+JOIN_BATCH = 1 << 18
+
+
+# Reads the (prefix, origin ASN) pairs of RouteViews .pfx2as files. MOAS origins ("a_b") and
+# AS sets ("a,b") give one pair per ASN.
+def read_pfx2as_origins(filenames):
+    prefixes = list()
+    origins = list()
+    for filename in filenames:
+        with open(filename, 'r') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) < 3:
+                    continue
+                for asn in parts[2].replace(',', '_').split('_'):
+                    prefixes.append(f"{parts[0]}/{parts[1]}")
+                    origins.append(asn)
+    return prefixes, origins
+
+
+# Last address of every network: the host bits of (hi, lo) set, for a 32 or 128-bit family
+def network_ends(hi, lo, length, bits):
+    host_bits = bits - length.astype(np.int64)
+    lo_bits = np.minimum(host_bits, 64)
+    hi_bits = np.maximum(host_bits - 64, 0)
+    lo_mask = np.where(lo_bits == 64, np.uint64(MASK_64), (np.uint64(1) << lo_bits.astype(np.uint64)) - np.uint64(1))
+    hi_mask = np.where(hi_bits == 64, np.uint64(MASK_64), (np.uint64(1) << hi_bits.astype(np.uint64)) - np.uint64(1))
+    return hi | hi_mask, lo | lo_mask
+
+
+# Number of addresses in [start, end], as a float (exact up to float rounding even for IPv6)
+def range_sizes(start_hi, start_lo, end_hi, end_lo):
+    borrow = (end_lo < start_lo).astype(np.uint64)
+    diff_hi = end_hi - start_hi - borrow
+    diff_lo = end_lo - start_lo
+    return diff_hi.astype(np.float64) * 2.0 ** 64 + diff_lo.astype(np.float64) + 1.0
+
+
+# Builds the range table of one family from parallel start/end/country arrays: ranges are sorted
+# by start and countries are stored as indexes into the sorted list of country codes
+def build_ranges(start_hi, start_lo, end_hi, end_lo, countries):
+    codes, country_index = np.unique(np.asarray(countries, dtype=str), return_inverse=True)
+    starts = pack_addresses(start_hi, start_lo)
+    order = np.argsort(starts, kind='stable')
+    return {
+        'start_hi': start_hi[order], 'start_lo': start_lo[order],
+        'end_hi': end_hi[order], 'end_lo': end_lo[order],
+        'starts': starts[order], 'ends': pack_addresses(end_hi, end_lo)[order],
+        'country': country_index[order], 'codes': codes.tolist(),
+    }
+
+
+# Builds the range tables of both families from (is_v6, start_hi, start_lo, end_hi, end_lo, country) rows
+def build_geo_index(rows):
+    rows = list(rows)
+    index = dict()
+    for version, is_v6 in (('ipv4', False), ('ipv6', True)):
+        family = [row for row in rows if row[0] == is_v6]
+        arrays = [np.array([row[i] for row in family], dtype=np.uint64) for i in range(1, 5)]
+        index[version] = build_ranges(*arrays, [row[5] for row in family])
+    return index
+
+
+# Splits an address string into its upper and lower 64 bits
+def _address_words(address):
+    if ':' in address:
+        value = int.from_bytes(socket.inet_pton(socket.AF_INET6, address), 'big')
+        return True, value >> 64, value & MASK_64
+    return False, 0, int.from_bytes(socket.inet_pton(socket.AF_INET, address), 'big')
+
+
+# Loads a range CSV ("start_ip,end_ip,country_code" per line, e.g. DB-IP's ip-to-country-lite)
+def load_range_csv(filename):
+    rows = list()
+    with open(filename, 'r', newline='') as f:
+        for row in csv.reader(f):
+            if len(row) < 3 or not row[2] or row[2] in ('ZZ', '-'):
+                continue
+            try:
+                is_v6, start_hi, start_lo = _address_words(row[0].strip())
+                _, end_hi, end_lo = _address_words(row[1].strip())
+            except OSError:
+                continue  # header or malformed line
+            rows.append((is_v6, start_hi, start_lo, end_hi, end_lo, row[2].strip()))
+    return build_geo_index(rows)
+
+
+# Loads MaxMind's GeoLite2 Country CSV edition: the Blocks-IPv4/IPv6 network files and the
+# Locations file mapping geoname ids to ISO codes. Networks without a located country fall back
+# to their registered country.
+def load_geolite2_csv(block_files, locations_file):
+    with open(locations_file, 'r', newline='') as f:
+        iso_per_geoname = {row['geoname_id']: row['country_iso_code'] for row in csv.DictReader(f)}
+    networks = list()
+    countries = list()
+    for block_file in block_files:
+        with open(block_file, 'r', newline='') as f:
+            for row in csv.DictReader(f):
+                country = iso_per_geoname.get(row['geoname_id']) or iso_per_geoname.get(row['registered_country_geoname_id'])
+                if country:
+                    networks.append(row['network'])
+                    countries.append(country)
+    return geo_index_from_networks(networks, countries)
+
+
+# Loads a MaxMind .mmdb database (needs the maxminddb package, 2.3 or later for iteration)
+def load_mmdb(filename):
+    import maxminddb
+    networks = list()
+    countries = list()
+    with maxminddb.open_database(filename) as reader:
+        for network, record in reader:
+            record = record or dict()
+            country = (record.get('country') or record.get('registered_country') or dict()).get('iso_code')
+            if country:
+                networks.append(str(network))
+                countries.append(country)
+    return geo_index_from_networks(networks, countries)
+
+
+# Builds the range tables from CIDR networks and their countries
+def geo_index_from_networks(networks, countries):
+    parsed = parse_prefixes(networks)
+    countries = np.asarray(countries, dtype=str)
+    index = dict()
+    for version, is_v6, bits in (('ipv4', False, 32), ('ipv6', True, 128)):
+        selected = parsed['ok'] & (parsed['v6'] == is_v6)
+        hi, lo = parsed['hi'][selected], parsed['lo'][selected]
+        end_hi, end_lo = network_ends(hi, lo, parsed['len'][selected], bits)
+        index[version] = build_ranges(hi, lo, end_hi, end_lo, countries[selected])
+    return index
+
+
+# Range-joins prefixes of one family against its range table. Returns (prefix, country, percentage)
+# arrays with one entry per overlapping range.
+def join_prefixes(ranges, hi, lo, length, bits):
+    end_hi, end_lo = network_ends(hi, lo, length, bits)
+    first = np.searchsorted(ranges['ends'], pack_addresses(hi, lo), side='left')
+    last = np.searchsorted(ranges['starts'], pack_addresses(end_hi, end_lo), side='right')
+    counts = np.maximum(last - first, 0)
+    prefix = np.repeat(np.arange(len(hi)), counts)
+    offsets = np.cumsum(counts) - counts
+    matched = first[prefix] + np.arange(len(prefix)) - np.repeat(offsets, counts)
+
+    # Overlap of every (prefix, range) pair: [max(starts), min(ends)]
+    later_start = ranges['starts'][matched] > pack_addresses(hi[prefix], lo[prefix])
+    ostart_hi = np.where(later_start, ranges['start_hi'][matched], hi[prefix])
+    ostart_lo = np.where(later_start, ranges['start_lo'][matched], lo[prefix])
+    earlier_end = ranges['ends'][matched] < pack_addresses(end_hi[prefix], end_lo[prefix])
+    oend_hi = np.where(earlier_end, ranges['end_hi'][matched], end_hi[prefix])
+    oend_lo = np.where(earlier_end, ranges['end_lo'][matched], end_lo[prefix])
+
+    covered = range_sizes(ostart_hi, ostart_lo, oend_hi, oend_lo)
+    prefix_size = 2.0 ** (bits - length[prefix].astype(np.float64))
+    return prefix, ranges['country'][matched], 100 * covered / prefix_size
+
+
+# Geolocates the origin ASes of the given pfx2as files. Returns {asn: {'ipv4': {cc: coverage},
+# 'ipv6': {cc: coverage}}} like the RIPEstat-based output.
+def geolocate_ases_offline(pfx2as_files, geo_index, batch_size=JOIN_BATCH):
+    prefixes, origins = read_pfx2as_origins(pfx2as_files)
+    parsed = parse_prefixes(prefixes)
+    asns, asn_index = np.unique(np.asarray(origins, dtype=str), return_inverse=True)
+    coverage_per_as = {asn: {'ipv4': dict(), 'ipv6': dict()} for asn in asns.tolist()}
+
+    for version, is_v6, bits in (('ipv4', False, 32), ('ipv6', True, 128)):
+        ranges = geo_index[version]
+        rows = np.flatnonzero(parsed['ok'] & (parsed['v6'] == is_v6))
+        codes = ranges['codes']
+        totals = np.zeros(len(asns) * len(codes), dtype=np.float64)
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            prefix, country, percentage = join_prefixes(ranges, parsed['hi'][batch], parsed['lo'][batch],
+                                                        parsed['len'][batch], bits)
+            keys = asn_index[batch[prefix]] * len(codes) + country
+            totals += np.bincount(keys, weights=percentage, minlength=len(totals))
+        for key in np.flatnonzero(totals).tolist():
+            asn, country = divmod(key, len(codes))
+            coverage_per_as[asns[asn]][version][codes[country]] = float(totals[key])
+
+    return coverage_per_as
+
+
+# Writes contents to a json file
+def write_json(jsonfilename, content):
+    with open(jsonfilename, 'w+') as fp:
+        json.dump(content, fp, indent=4)
+
+
+if __name__ == "__main__":
+    pfx2as_files = [
+        '../../BGPCarbonAware/Links_Def/CalculateN/routeviews-rv2-20250501-1200.pfx2as',  # IPv4
+        '../../BGPCarbonAware/Links_Def/CalculateN/routeviews-rv6-20250501-1200.pfx2as'   # IPv6
+    ]
+    # GeoLite2 Country CSV edition; load_range_csv or load_mmdb read the other formats
+    geo_index = load_geolite2_csv(['geolite2/GeoLite2-Country-Blocks-IPv4.csv', 'geolite2/GeoLite2-Country-Blocks-IPv6.csv'],
+                                  'geolite2/GeoLite2-Country-Locations-en.csv')
+    coverage_per_as = geolocate_ases_offline(pfx2as_files, geo_index)
+    write_json('output/presence_per_AS_offline_may_2025.json', coverage_per_as)
@@ -1,6 +1,7 @@
 import json
 from pprint import pprint as pprint
 from collections import Counter
+from peeringdb_store import read_sections
 # PeeringDB, as the name suggests, was set up to facilitate peering between networks and peering coordinators. 
 # In recent years, the vision of PeeringDB has developed to keep up with the speed and diverse manner in which 
 # the Internet is growing. The database is no longer just for peering and peering related information. It now 
@@ -77,25 +78,63 @@ def map_ix_countries_to_asns(file_data):
 
 # Merges dictionaries
 def merge(d1, d2):
-    dd = dict()
-    for d in (d1, d2):  
+    # Each AS's countries are counted once, in order of first occurrence, and turned into the
+    # percentage of all its occurrences
+    counts = dict()
+    for d in (d1, d2):
         for key, value in d.items():
-            # Since value is a list of country, we flatten this list by passing one by one 
-            # the countries into the merged dictionary
-            if key not in dd:
-                dd[key] = list()
-            for val in value:
-                dd[key].append(val)
-    # The following one liner generates a new dictionary (dd_final) that maps each key from the original dictionary (dd) to a sub-dictionary. 
-    # Each sub-dictionary contains the ratio of occurrences for each unique item in the corresponding list of the original dictionary. 
-    dd_final = {key: {item: dd[key].count(item) / len(dd[key]) for item in set(dd[key])} for key in dd}
-    result_dict = {key: {sub_key: value * 100 for sub_key, value in sub_dict.items()} for key, sub_dict in dd_final.items()}
+            if key not in counts:
+                counts[key] = Counter()
+            counts[key].update(value)
+    result_dict = dict()
+    for key, counter in counts.items():
+        total = sum(counter.values())
+        result_dict[key] = {item: count / total * 100 for item, count in counter.items()}
+    return result_dict
+
+
+# Computes the presence of every AS per country in a single pass over netfac and netixlan.
+# Every facility record weighs fac_weight and every IXP record ix_weight; with dedup, an AS
+# counts each facility and each IXP once however many records it has there. The defaults give
+# the same percentages as merge(map_fac_countries_to_asns(...), map_ix_countries_to_asns(...)).
+def presence_per_asn(file_data, fac_weight=1, ix_weight=1, dedup=False):
+    ix_country = {str(item['id']): item['country'] for item in file_data['ix']['data']}
+    weights = dict()
+    seen = set()
+
+    def add(asn, country, weight, site):
+        if dedup:
+            if site in seen:
+                return
+            seen.add(site)
+        if asn not in weights:
+            weights[asn] = dict()
+        weights[asn][country] = weights[asn].get(country, 0) + weight
+
+    for item in file_data['netfac']['data']:
+        country = item['country']
+        if country == "":
+            continue
+        asn = str(item['local_asn'])
+        add(asn, country, fac_weight, ('fac', asn, item['fac_id']))
+    for item in file_data['netixlan']['data']:
+        asn = str(item['asn'])
+        ix_id = str(item['ix_id'])
+        add(asn, ix_country[ix_id], ix_weight, ('ix', asn, ix_id))
+
+    result_dict = dict()
+    for asn, per_country in weights.items():
+        total = sum(per_country.values())
+        if total > 0:
+            result_dict[asn] = {country: weight / total * 100 for country, weight in per_country.items()}
     return result_dict
 
 
 if __name__ == "__main__":
     # We downloaded the CAIDA's snapshot for PeeringDB'
-    file_data = read_json("../caida/peeringdb_2_dump_2025_05_01.json")
+    # Only the sections used below are streamed out of the dump, into an indexed store that
+    # later runs reuse (see peeringdb_store.py)
+    file_data = read_sections("../caida/peeringdb_2_dump_2025_05_01.json", ['netfac', 'ix', 'netixlan'])
 
     # If we print file_data.keys() some of the object we get are:
     # 'fac'     # Describes a facility / colocation record.
@@ -110,9 +149,9 @@ if __name__ == "__main__":
 
     # We 'll use netfac object and map each country/city to a specific ASn.
     # Netfac returns the facilities (datacenters) at which the ASn is present.
-    map_1 = map_fac_countries_to_asns(file_data)
-    map_2 = map_ix_countries_to_asns(file_data)
-    merged = merge(map_1, map_2)
+    # Netixlan returns the IXPs; both are counted in one pass. Pass fac_weight/ix_weight to weigh
+    # facilities and IXPs differently, or dedup=True to count every site once per AS.
+    merged = presence_per_asn(file_data)
     
     # Write results into json
     write_json('output/presence_per_AS_peeringdb_may_2025.json', merged)
\ No newline at end of file
@@ -1,9 +1,12 @@
-import csv
+import os
 import sys
-import bz2
 import json
-import requests
-import concurrent.futures
+from ripestat_client import RIPESTAT_URL, run_geolocation
+from geo_cache import open_cache, store_coverage, cached_ases, reuse_fresh, evict_stale, load_coverage
+
+# CAIDA datasets are read through the shared loader in ../caida
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'caida'))
+from caida_loader import load_as_rel, rel_ases
 
 # Prints a progress bar
 def print_progress_bar(progress, total, width=25):
@@ -16,65 +19,47 @@ def write_json(jsonfilename, content):
     with open(jsonfilename, 'w+') as fp:
         json.dump(content, fp, indent=4)
 
-# Reads the AS topology dataset in a dictionary 
-def read_topology(as2rel_mapping):
-    as2rel_dict = dict()
-    with bz2.BZ2File(as2rel_mapping, 'rb') as compressed_file:
-        decompressed_data = compressed_file.read().decode('utf-8').splitlines()
-        csvreader = csv.reader(decompressed_data, delimiter='|')
-        for row in csvreader:
-            if row[0][0] != '#':  # ignore lines starting with "#"
-                as1 = row[0]
-                as2 = row[1]
-                rel = int(row[2])
-                if as1 not in as2rel_dict:
-                    as2rel_dict[as1] = list()
-                as2rel_dict[as1].append([as2, rel])
-                if as2 not in as2rel_dict:
-                    as2rel_dict[as2] = list()
-                as2rel_dict[as2].append([as1, -rel])
-    return as2rel_dict
-
-def geolocate_AS_maxmind(AS):
-    coverage_per_country = dict()
-    coverage_per_country['ipv4'] = dict()
-    coverage_per_country['ipv6'] = dict()
-    
-    URL = "https://stat-ui.stat.ripe.net/data/maxmind-geo-lite-announced-by-as/data.json"
-    PARAMS = {'resource':AS}
-    try:
-        req = requests.get(url=URL, params=PARAMS)
-        res = req.json()['data']['located_resources']
-        for item in res:
-            prefix = item['resource']
-            if ':' in prefix:
-                version = 'ipv6'
-            else:
-                version = 'ipv4'
-            for location in item['locations']:
-                country_iso = location['country']
-                coverage = location['covered_percentage']
-                if country_iso in coverage_per_country[version]:
-                    coverage_per_country[version][country_iso] += coverage
-                else:
-                    coverage_per_country[version][country_iso] = coverage
-    except Exception as e:
-        print(f"An exception occurred: {e}")
+# Writes the ASNs that could not be geolocated, with the error of their last attempt
+def write_failed(filename, failed):
+    with open(filename, 'w') as f:
+        for asn, error in failed.items():
+            f.write(f"{asn}|{error}\n")
 
-    return coverage_per_country
+if __name__ == "__main__":
+    version = '2025-05'
+    # Set refresh to True to reuse the entries fetched less than ttl seconds ago by earlier runs
+    # and only query the stale ASes again; older entries of other versions are evicted
+    refresh = False
+    ttl = 30 * 24 * 3600
 
-def process_asn(asn):
-    return asn, geolocate_AS_maxmind(asn)
+    all_ases = rel_ases(load_as_rel('../caida/20250501.as-rel2.txt.bz2')).astype(str).tolist()
+    cache = open_cache('output/geolocation_cache.sqlite')
+    if refresh:
+        print(f"Reused {reuse_fresh(cache, version, ttl)} fresh cache entries")
+        evict_stale(cache, ttl, keep_versions=[version])
+    # ASes already stored for this version (by an interrupted run or a refresh) are skipped; in
+    # refresh mode only if their entry is still fresh. A stale entry stays in the output until its
+    # AS is fetched again successfully.
+    done_ases = cached_ases(cache, version, ttl if refresh else None)
+    pending = [asn for asn in all_ases if asn not in done_ases]
+    print(f"{len(all_ases) - len(pending)} ASes cached, {len(pending)} to query")
+    done = [0]
 
-# Adjust the number of threads based on your system and requirements
-num_threads = 8
-coverage_per_as = dict()
-all_ases = read_topology('../caida/20250501.as-rel2.txt.bz2').keys()
-with concurrent.futures.ThreadPoolExecutor(max_workers=num_threads) as executor:
-    # Use executor.map to process ASNs concurrently
-    results = executor.map(process_asn, all_ases)
-    for i, (asn, coverage) in enumerate(results):
-        coverage_per_as[asn] = coverage
-        print_progress_bar(i, len(all_ases))
+    def on_result(asn, coverage, error):
+        if error is None:
+            store_coverage(cache, asn, version, coverage)
+        print_progress_bar(done[0], len(pending))
+        done[0] += 1
 
-write_json('output/presence_per_AS_maxmind_may_2025.json', coverage_per_as)
\ No newline at end of file
+    # Concurrency and rate are kept within RIPEstat's fair-use limits; point url at a local
+    # server to test without hitting RIPEstat
+    _, failed = run_geolocation(pending, url=RIPESTAT_URL, concurrency=8, rate=10.0, max_retries=5,
+                                on_result=on_result)
+    # Keep the topology's AS order in the output
+    results = load_coverage(cache, version)
+    coverage_per_as = {asn: results[asn] for asn in all_ases if asn in results}
+    write_json('output/presence_per_AS_maxmind_may_2025.json', coverage_per_as)
+    if failed:
+        write_failed('output/presence_per_AS_maxmind_may_2025_failed.txt', failed)
+        print(f"\n{len(failed)} ASes could not be geolocated, see output/presence_per_AS_maxmind_may_2025_failed.txt")
+        print("Run again to retry them, cached ASes are not queried again")
@@ -1,6 +1,7 @@
 import json
 from pprint import pprint as pprint
 from collections import defaultdict
+from peeringdb_store import read_sections
 
 # reads content of json file and returns
 def read_json(jsonfilename):
@@ -45,7 +46,9 @@ def map_fac_to_asns(file_data):
 
 if __name__ == "__main__":
     # We downloaded the CAIDA's snapshot for PeeringDB'
-    file_data = read_json("../caida/peeringdb_2_dump_2025_05_01.json")
+    # Only the sections used below are streamed out of the dump, into an indexed store that
+    # later runs reuse (see peeringdb_store.py)
+    file_data = read_sections("../caida/peeringdb_2_dump_2025_05_01.json", ['fac', 'netfac'])
 
     # If we print file_data.keys() some of the object we get are:
     # 'fac'     # Describes a facility / colocation record.
@@ -0,0 +1,113 @@
+import json
+import os
+import sqlite3
+import warnings
+
+# Indexed SQLite store of the PeeringDB dump sections the geolocation scripts use.
+# The dump (one JSON object with a {"data": [...]} entry per section) is several hundred MB and
+# most of it (poc, ixpfx, ...) is never read. Only the requested sections are streamed out of it
+# with ijson, keeping the columns listed below, into <dump>.sqlite next to the dump. Later runs and
+# other scripts read the store instead of parsing the JSON again; a section missing from the store
+# is added on first use, and the store is rebuilt when the dump changes. Streaming needs ijson
+# (see requirements.txt); parsing the whole dump in memory instead has to be asked for with
+# allow_full_load.
+
+# Columns kept per section, in PeeringDB's field names
+SECTION_COLUMNS = {
+    'fac': ['id', 'org_id', 'name', 'city', 'country', 'latitude', 'longitude'],
+    'ix': ['id', 'org_id', 'name', 'city', 'country'],
+    'net': ['id', 'org_id', 'asn', 'name', 'info_type'],
+    'org': ['id', 'name', 'country'],
+    'netfac': ['id', 'net_id', 'fac_id', 'local_asn', 'city', 'country'],
+    'netixlan': ['id', 'net_id', 'ix_id', 'ixlan_id', 'asn', 'speed'],
+}
+
+# Columns indexed per section
+SECTION_INDEXES = {
+    'fac': ['id'],
+    'ix': ['id'],
+    'net': ['id', 'asn'],
+    'org': ['id'],
+    'netfac': ['local_asn', 'fac_id'],
+    'netixlan': ['asn', 'ix_id'],
+}
+
+
+# Name of the store that belongs to a dump
+def store_file(dump_file):
+    return dump_file + '.sqlite'
+
+
+# Size and modification time of the dump, to tell whether the store is still current
+def _dump_signature(dump_file):
+    stat = os.stat(dump_file)
+    return f"{stat.st_size}:{int(stat.st_mtime)}"
+
+
+# Yields (section, items) for each requested section of the dump. Every section is streamed with
+# ijson without loading the rest of the dump. Without ijson, the dump is parsed once for all
+# sections if allow_full_load is set, and an ImportError is raised otherwise.
+def iter_sections(dump_file, sections, allow_full_load=False):
+    try:
+        import ijson
+    except ImportError:
+        if not allow_full_load:
+            raise ImportError("ijson is required to stream the PeeringDB dump (pip install ijson); "
+                              "pass allow_full_load=True to load the whole dump into memory instead")
+        warnings.warn("ijson is not installed: the whole PeeringDB dump is loaded into memory")
+        with open(dump_file, 'r') as f:
+            dump = json.load(f)
+        for section in sections:
+            yield section, dump[section]['data']
+        return
+    for section in sections:
+        with open(dump_file, 'rb') as f:
+            yield section, ijson.items(f, f'{section}.data.item', use_float=True)
+
+
+# Copies the items of a section into its table
+def _load_section(conn, section, items):
+    columns = SECTION_COLUMNS[section]
+    conn.execute(f"DROP TABLE IF EXISTS {section}")
+    conn.execute(f"CREATE TABLE {section} ({', '.join(columns)})")
+    insert = f"INSERT INTO {section} VALUES ({', '.join('?' * len(columns))})"
+    conn.executemany(insert, ([item.get(column) for column in columns] for item in items))
+    for column in SECTION_INDEXES[section]:
+        conn.execute(f"CREATE INDEX {section}_{column} ON {section} ({column})")
+    conn.execute("INSERT OR REPLACE INTO sections VALUES (?)", (section,))
+    conn.commit()
+
+
+# Opens the store of a dump, streaming the requested sections into it if they are not there yet
+def open_store(dump_file, sections, allow_full_load=False):
+    conn = sqlite3.connect(store_file(dump_file))
+    conn.row_factory = sqlite3.Row
+    conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+    conn.execute("CREATE TABLE IF NOT EXISTS sections (name TEXT PRIMARY KEY)")
+    signature = _dump_signature(dump_file)
+    row = conn.execute("SELECT value FROM meta WHERE key = 'dump'").fetchone()
+    if row is None or row['value'] != signature:
+        # New or changed dump: forget every section loaded from the previous one
+        conn.execute("DELETE FROM sections")
+        conn.execute("INSERT OR REPLACE INTO meta VALUES ('dump', ?)", (signature,))
+        conn.commit()
+    loaded = {row['name'] for row in conn.execute("SELECT name FROM sections")}
+    missing = [section for section in sections if section not in loaded]
+    if missing:
+        for section, items in iter_sections(dump_file, missing, allow_full_load):
+            _load_section(conn, section, items)
+    return conn
+
+
+# Returns the rows of a section in dump order; rows are indexed by field name like the dump's items
+def section_rows(conn, section):
+    return conn.execute(f"SELECT * FROM {section} ORDER BY rowid").fetchall()
+
+
+# Reads the requested sections in the layout of the JSON dump, {section: {'data': rows}}, so code
+# written against json.load of the dump keeps working
+def read_sections(dump_file, sections, allow_full_load=False):
+    conn = open_store(dump_file, sections, allow_full_load)
+    file_data = {section: {'data': section_rows(conn, section)} for section in sections}
+    conn.close()
+    return file_data
@@ -0,0 +1,129 @@
+import asyncio
+import random
+import time
+import aiohttp
+
+# Asynchronous client for the RIPEstat maxmind-geo-lite-announced-by-as data call.
+# All requests share one keep-alive connection pool; at most `concurrency` of them are in flight
+# and a token bucket caps the request rate. Transient failures (connection errors, timeouts,
+# 429 and 5xx answers) are retried with exponential backoff, honouring Retry-After when the
+# server sends it. ASNs still failing after the last retry are reported back, not returned empty.
+
+RIPESTAT_URL = "https://stat-ui.stat.ripe.net/data/maxmind-geo-lite-announced-by-as/data.json"
+
+# Statuses worth retrying; anything else (e.g. 400 for a malformed resource) fails immediately
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+# Sums the covered percentage of every country over the announced prefixes, per IP version
+def coverage_from_response(response):
+    coverage_per_country = dict()
+    coverage_per_country['ipv4'] = dict()
+    coverage_per_country['ipv6'] = dict()
+    for item in response['data']['located_resources']:
+        prefix = item['resource']
+        if ':' in prefix:
+            version = 'ipv6'
+        else:
+            version = 'ipv4'
+        for location in item['locations']:
+            country_iso = location['country']
+            coverage = location['covered_percentage']
+            if country_iso in coverage_per_country[version]:
+                coverage_per_country[version][country_iso] += coverage
+            else:
+                coverage_per_country[version][country_iso] = coverage
+    return coverage_per_country
+
+
+# Returns a coroutine function that waits for a token of a bucket refilled at `rate` tokens per
+# second and holding at most `burst` tokens
+def make_rate_limiter(rate, burst=1):
+    bucket = {'tokens': float(burst), 'updated': time.monotonic()}
+    lock = asyncio.Lock()
+
+    async def acquire():
+        async with lock:
+            while True:
+                now = time.monotonic()
+                bucket['tokens'] = min(burst, bucket['tokens'] + (now - bucket['updated']) * rate)
+                bucket['updated'] = now
+                if bucket['tokens'] >= 1:
+                    bucket['tokens'] -= 1
+                    return
+                await asyncio.sleep((1 - bucket['tokens']) / rate)
+
+    return acquire
+
+
+# Seconds to wait before retry number `attempt`: Retry-After if the server gave one, otherwise
+# exponential backoff with jitter
+def retry_delay(attempt, backoff, retry_after=None):
+    if retry_after is not None:
+        try:
+            return max(0.0, float(retry_after))
+        except ValueError:
+            pass  # HTTP-date form, fall back to our own backoff
+    return backoff * (2 ** attempt) * (0.5 + random.random())
+
+
+# Fetches the country coverage of one ASN, retrying transient failures.
+# Raises the last error once max_retries retries are used up.
+async def fetch_coverage(session, url, asn, acquire, max_retries=5, backoff=1.0):
+    attempt = 0
+    while True:
+        await acquire()
+        retry_after = None
+        try:
+            async with session.get(url, params={'resource': asn}) as response:
+                if response.status in RETRY_STATUSES:
+                    retry_after = response.headers.get('Retry-After')
+                    raise aiohttp.ClientResponseError(response.request_info, response.history,
+                                                      status=response.status, message=response.reason)
+                response.raise_for_status()
+                return coverage_from_response(await response.json(content_type=None))
+        except aiohttp.ClientResponseError as e:
+            if e.status not in RETRY_STATUSES or attempt >= max_retries:
+                raise
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            if attempt >= max_retries:
+                raise
+        await asyncio.sleep(retry_delay(attempt, backoff, retry_after))
+        attempt += 1
+
+
+# Geolocates the given ASNs. Returns (coverage_per_as, failed), where failed maps each ASN that
+# could not be fetched to its error. on_result(asn, coverage, error) is called as results arrive.
+async def geolocate_ases(asns, url=RIPESTAT_URL, concurrency=8, rate=10.0, max_retries=5, backoff=1.0,
+                         timeout=60, on_result=None):
+    coverage_per_as = dict()
+    failed = dict()
+    queue = asyncio.Queue()
+    for asn in asns:
+        queue.put_nowait(asn)
+    acquire = make_rate_limiter(rate, burst=concurrency)
+
+    async def worker(session):
+        while True:
+            try:
+                asn = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            coverage, error = None, None
+            try:
+                coverage = await fetch_coverage(session, url, asn, acquire, max_retries, backoff)
+                coverage_per_as[asn] = coverage
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError, KeyError, TypeError) as e:
+                error = failed[asn] = f"{type(e).__name__}: {e}"
+            if on_result is not None:
+                on_result(asn, coverage, error)
+
+    connector = aiohttp.TCPConnector(limit=concurrency, keepalive_timeout=60)
+    async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=timeout)) as session:
+        await asyncio.gather(*(worker(session) for _ in range(concurrency)))
+    return coverage_per_as, failed
+
+
+# Blocking wrapper around geolocate_ases for scripts
+def run_geolocation(asns, **kwargs):
+    return asyncio.run(geolocate_ases(list(asns), **kwargs))
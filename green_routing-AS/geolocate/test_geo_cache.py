@@ -0,0 +1,27 @@
+import time
+from geo_cache import open_cache, store_coverage, cached_ases, reuse_fresh, load_coverage
+
+DAY = 24 * 3600
+
+
+def test_reuse_fresh_replaces_stale_entry_of_version(tmp_path):
+    conn = open_cache(str(tmp_path / 'cache.db'))
+    now = time.time()
+    store_coverage(conn, 3356, '2025-05', {'US': 1.0}, fetched_at=now - 40 * DAY)
+    store_coverage(conn, 3356, '2025-04', {'US': 0.5, 'DE': 0.5}, fetched_at=now - DAY)
+    assert cached_ases(conn, '2025-05', ttl=30 * DAY) == set()
+
+    assert reuse_fresh(conn, '2025-05', 30 * DAY) == 1
+    assert load_coverage(conn, '2025-05') == {'3356': {'US': 0.5, 'DE': 0.5}}
+    assert cached_ases(conn, '2025-05', ttl=30 * DAY) == {'3356'}
+
+
+def test_reuse_fresh_keeps_fresher_entry_of_version(tmp_path):
+    conn = open_cache(str(tmp_path / 'cache.db'))
+    now = time.time()
+    store_coverage(conn, 174, '2025-05', {'US': 1.0}, fetched_at=now - DAY)
+    store_coverage(conn, 174, '2025-04', {'FR': 1.0}, fetched_at=now - 2 * DAY)
+    store_coverage(conn, 1299, '2025-04', {'SE': 1.0}, fetched_at=now - 3 * DAY)
+
+    assert reuse_fresh(conn, '2025-05', 30 * DAY) == 1
+    assert load_coverage(conn, '2025-05') == {'174': {'US': 1.0}, '1299': {'SE': 1.0}}
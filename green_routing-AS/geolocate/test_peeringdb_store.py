@@ -0,0 +1,56 @@
+import json
+import sys
+import types
+import pytest
+from peeringdb_store import read_sections
+
+DUMP = {
+    'fac': {'data': [{'id': 1, 'org_id': 7, 'name': 'Fac One', 'city': 'Paris', 'country': 'FR',
+                      'latitude': 48.85, 'longitude': 2.35, 'status': 'ok'},
+                     {'id': 2, 'org_id': 8, 'name': 'Fac Two', 'city': 'Berlin', 'country': 'DE',
+                      'latitude': None, 'longitude': None}]},
+    'netfac': {'data': [{'id': 10, 'net_id': 3, 'fac_id': 2, 'local_asn': 64500, 'city': 'Berlin', 'country': 'DE'}]},
+    'poc': {'data': [{'id': 99}]},
+}
+
+
+# Minimal stand-in for ijson.items: yields the items under a "<section>.data.item" prefix and
+# records the prefixes it was asked for
+def fake_ijson(requested):
+    def items(f, prefix, use_float=False):
+        requested.append(prefix)
+        section, _, _ = prefix.split('.')
+        yield from json.load(f)[section]['data']
+    return types.SimpleNamespace(items=items)
+
+
+@pytest.fixture
+def dump_file(tmp_path):
+    path = tmp_path / 'peeringdb_dump.json'
+    path.write_text(json.dumps(DUMP))
+    return str(path)
+
+
+def test_sections_are_streamed_with_ijson(dump_file, monkeypatch):
+    requested = list()
+    monkeypatch.setitem(sys.modules, 'ijson', fake_ijson(requested))
+    file_data = read_sections(dump_file, ['fac', 'netfac'])
+
+    assert requested == ['fac.data.item', 'netfac.data.item']
+    fac = [dict(row) for row in file_data['fac']['data']]
+    assert fac == [{key: item.get(key) for key in ['id', 'org_id', 'name', 'city', 'country', 'latitude', 'longitude']}
+                   for item in DUMP['fac']['data']]
+    assert file_data['netfac']['data'][0]['local_asn'] == 64500
+
+    # Stored sections are read from the store without parsing the dump again
+    read_sections(dump_file, ['fac'])
+    assert requested == ['fac.data.item', 'netfac.data.item']
+
+
+def test_missing_ijson_requires_opt_in(dump_file, monkeypatch):
+    monkeypatch.setitem(sys.modules, 'ijson', None)
+    with pytest.raises(ImportError):
+        read_sections(dump_file, ['fac'])
+    with pytest.warns(UserWarning):
+        file_data = read_sections(dump_file, ['fac'], allow_full_load=True)
+    assert [row['name'] for row in file_data['fac']['data']] == ['Fac One', 'Fac Two']
@@ -0,0 +1,262 @@
+import csv
+import json
+import os
+import shutil
+import sys
+import numpy as np
+
+# CAIDA datasets are read through the shared loader in ../caida
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'caida'))
+from caida_loader import load_as_rel, load_ppdc, load_as_org, rel_ases, org_strings
+
+# Shared ASN registry of a snapshot. The ASNs are kept sorted in one uint32 array and the dense
+# id of an ASN is its position in it (int32, -1 for ASNs not in the registry), so any stage can
+# turn ASNs into ids with one np.searchsorted and join attributes by array indexing. Attributes
+# are arrays aligned with the ASNs:
+#   intensity    float64  gCO2/kWh from map_co2_to_asn.py, NaN if unknown
+#   org          int32    index into registry['org_ids'] / registry['org_names'], -1 if unknown
+#   as_names     list     AS name of every ASN from as-org2info, '' if unknown
+#   cone_size    int32    size of the customer cone (ppdc-ases), 0 if none
+#   asdb_labels  CSR      label ids of every AS in asdb_label_offsets/asdb_label_ids, names in
+#                         registry['asdb_label_names']
+# A registry is saved as a directory of .npy files plus names.json and loaded memory-mapped.
+# Stages that produce an attribute (map_co2_to_asn.py the intensities, as2org_parser.py the
+# organizations) store it in the snapshot's registry with update_registry, adding their ASNs.
+
+ATTRIBUTE_FILL = {
+    'intensity': (np.float64, np.nan),
+    'org': (np.int32, -1),
+    'cone_size': (np.int32, 0),
+}
+
+
+# A registry of the given ASNs, without attributes
+def new_registry(asns):
+    return {'asns': np.unique(np.asarray(asns, dtype=np.uint32))}
+
+
+# Dense ids of the given ASNs; -1 for ASNs not in the registry
+def asn_ids(registry, asns):
+    registry_asns = registry['asns']
+    asns = np.asarray(asns, dtype=np.int64)
+    if len(registry_asns) == 0:
+        return np.full(len(asns), -1, dtype=np.int32)
+    idx = np.searchsorted(registry_asns, asns)
+    idx[idx == len(registry_asns)] = 0
+    return np.where(registry_asns[idx] == asns, idx, -1).astype(np.int32)
+
+
+# Sets an attribute from (asns, values); ASNs missing from the registry are ignored
+def set_attribute(registry, name, asns, values):
+    dtype, fill = ATTRIBUTE_FILL[name]
+    column = np.full(len(registry['asns']), fill, dtype=dtype)
+    ids = asn_ids(registry, asns)
+    known = ids >= 0
+    column[ids[known]] = np.asarray(values, dtype=dtype)[known]
+    registry[name] = column
+
+
+# Values of an attribute for the given ASNs; the attribute's fill value for unknown ASNs
+def attribute_of(registry, name, asns):
+    dtype, fill = ATTRIBUTE_FILL[name]
+    ids = asn_ids(registry, asns)
+    values = np.full(len(ids), fill, dtype=dtype)
+    known = ids >= 0
+    values[known] = registry[name][ids[known]]
+    return values
+
+
+# Adds ASNs to the registry, moving every per-AS attribute to the new ids
+def add_asns(registry, asns):
+    asns = np.unique(np.asarray(asns, dtype=np.uint32))
+    old_asns = registry['asns']
+    new_asns = np.union1d(old_asns, asns).astype(np.uint32)
+    if len(new_asns) == len(old_asns):
+        return registry
+    moved = np.searchsorted(new_asns, old_asns)
+    for name, (dtype, fill) in ATTRIBUTE_FILL.items():
+        if name in registry:
+            column = np.full(len(new_asns), fill, dtype=dtype)
+            column[moved] = registry[name]
+            registry[name] = column
+    if 'as_names' in registry:
+        as_names = [''] * len(new_asns)
+        for i, as_name in zip(moved.tolist(), registry['as_names']):
+            as_names[i] = as_name
+        registry['as_names'] = as_names
+    if 'asdb_label_offsets' in registry:
+        lengths = np.zeros(len(new_asns), dtype=np.int64)
+        lengths[moved] = np.diff(registry['asdb_label_offsets'])
+        offsets = np.zeros(len(new_asns) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        registry['asdb_label_offsets'] = offsets
+    registry['asns'] = new_asns
+    return registry
+
+
+# Org id and org name of every given ASN, as object arrays with None for unknown ASNs
+def org_of(registry, asns):
+    org = attribute_of(registry, 'org', asns)
+    known = np.flatnonzero(org >= 0)
+    org_ids = np.full(len(org), None, dtype=object)
+    org_names = np.full(len(org), None, dtype=object)
+    for i, o in zip(known.tolist(), org[known].tolist()):
+        org_ids[i] = registry['org_ids'][o]
+        org_names[i] = registry['org_names'][o]
+    return org_ids, org_names
+
+
+# AS name of every given ASN, None for unknown ASNs
+def as_name_of(registry, asns):
+    ids = asn_ids(registry, asns)
+    return [registry['as_names'][i] if i >= 0 else None for i in ids.tolist()]
+
+
+# ASDB labels of one ASN as names
+def asdb_labels(registry, asn):
+    i = asn_ids(registry, [asn])[0]
+    if i < 0:
+        return list()
+    offsets = registry['asdb_label_offsets']
+    return [registry['asdb_label_names'][label] for label in registry['asdb_label_ids'][offsets[i]:offsets[i + 1]].tolist()]
+
+
+# Reads an as2co2_intensity_*.json file into (asns, intensities)
+def read_intensities(jsonfilename):
+    with open(jsonfilename, 'r') as f:
+        as_co2_intensity = json.load(f)
+    return ([int(asn) for asn in as_co2_intensity],
+            [np.nan if v is None else v for v in as_co2_intensity.values()])
+
+
+# Sets the customer cone sizes from ppdc-ases (distinct members of every root)
+def add_cone_sizes(registry, ppdc_file):
+    ppdc = load_ppdc(ppdc_file)
+    roots = np.asarray(ppdc['roots']).astype(np.uint64)
+    pairs = np.repeat(roots, np.diff(ppdc['offsets'])) << np.uint64(32) | np.asarray(ppdc['members']).astype(np.uint64)
+    pairs = np.sort(pairs)
+    pairs = pairs[np.concatenate(([True], pairs[1:] != pairs[:-1]))]
+    pair_roots = pairs >> np.uint64(32)
+    starts = np.flatnonzero(np.concatenate(([True], pair_roots[1:] != pair_roots[:-1])))
+    cone_roots, sizes = pair_roots[starts], np.diff(np.append(starts, len(pairs)))
+    set_attribute(registry, 'cone_size', cone_roots, sizes)
+
+
+# Sets the organization and AS name of the given ASes: as_org_ids are their org ids, and the
+# org table (org_ids, org_names) is what the org column points into. ASNs missing from the
+# registry are ignored; when an ASN repeats, its first entry is kept.
+def set_organizations(registry, asns, as_names, as_org_ids, org_ids, org_names):
+    org_index = {org_id: i for i, org_id in enumerate(org_ids)}
+    asns = np.asarray(asns, dtype=np.uint32)
+    _, first = np.unique(asns, return_index=True)
+    first = np.sort(first)
+    registry['org_ids'] = list(org_ids)
+    registry['org_names'] = list(org_names)
+    set_attribute(registry, 'org', asns[first], [org_index.get(as_org_ids[i], -1) for i in first.tolist()])
+    registry['as_names'] = [''] * len(registry['asns'])
+    for i, j in zip(asn_ids(registry, asns[first]).tolist(), first.tolist()):
+        if i >= 0:
+            registry['as_names'][i] = as_names[j]
+
+
+# Sets the organization of every AS from as-org2info; orgs are numbered in file order
+def add_organizations(registry, as_org_file):
+    as_org = load_as_org(as_org_file)
+    set_organizations(registry, as_org['aut_asn'], org_strings(as_org, 'aut_name'), org_strings(as_org, 'aut_org_id'),
+                      org_strings(as_org, 'org_id'), org_strings(as_org, 'org_name'))
+
+
+# Sets the ASDB labels from the categorized ASes CSV (ASN column, then one column per label)
+def add_asdb_labels(registry, asdb_csv):
+    names = dict()
+    labels_per_id = dict()
+    with open(asdb_csv, 'r', newline='') as f:
+        for row in csv.DictReader(f):
+            i = asn_ids(registry, [int(row['ASN'].strip('AS'))])[0]
+            if i < 0:
+                continue
+            labels = [label for label in list(row.values())[1:] if label]
+            labels_per_id[i] = [names.setdefault(label, len(names)) for label in labels]
+    lengths = np.zeros(len(registry['asns']), dtype=np.int64)
+    for i, labels in labels_per_id.items():
+        lengths[i] = len(labels)
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    label_ids = np.zeros(offsets[-1], dtype=np.int16)
+    for i, labels in labels_per_id.items():
+        label_ids[offsets[i]:offsets[i + 1]] = labels
+    registry['asdb_label_offsets'] = offsets
+    registry['asdb_label_ids'] = label_ids
+    registry['asdb_label_names'] = list(names)
+
+
+# Builds the registry of a snapshot: the ASes of as-rel2 and of the intensities, plus every
+# attribute whose source is given
+def build_registry(as_rel_file, intensity_json=None, ppdc_file=None, as_org_file=None, asdb_csv=None):
+    asns = rel_ases(load_as_rel(as_rel_file))
+    if intensity_json:
+        intensity_asns, intensities = read_intensities(intensity_json)
+        asns = np.concatenate((asns, np.array(intensity_asns, dtype=np.uint32)))
+    registry = new_registry(asns)
+    if intensity_json:
+        set_attribute(registry, 'intensity', intensity_asns, intensities)
+    if ppdc_file:
+        add_cone_sizes(registry, ppdc_file)
+    if as_org_file:
+        add_organizations(registry, as_org_file)
+    if asdb_csv:
+        add_asdb_labels(registry, asdb_csv)
+    return registry
+
+
+# Names (lists of strings) are kept in names.json, arrays in .npy files
+NAME_KEYS = ('org_ids', 'org_names', 'as_names', 'asdb_label_names')
+
+
+# Writes the registry to a temporary directory moved into place at the end, so a registry can be
+# saved over the (memory-mapped) one it was loaded from
+def save_registry(registry, registry_dir):
+    tmp_dir = registry_dir + '.tmp'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    names = dict()
+    for key, value in registry.items():
+        if key in NAME_KEYS:
+            names[key] = list(value)
+        else:
+            np.save(os.path.join(tmp_dir, key + '.npy'), value)
+    with open(os.path.join(tmp_dir, 'names.json'), 'w') as f:
+        json.dump(names, f)
+    shutil.rmtree(registry_dir, ignore_errors=True)
+    os.rename(tmp_dir, registry_dir)
+
+
+def load_registry(registry_dir):
+    registry = {name[:-4]: np.load(os.path.join(registry_dir, name), mmap_mode='r')
+                for name in os.listdir(registry_dir) if name.endswith('.npy')}
+    with open(os.path.join(registry_dir, 'names.json'), 'r') as f:
+        registry.update(json.load(f))
+    return registry
+
+
+# Loads the registry of a snapshot (an empty one if there is none yet) with the given ASNs added,
+# for a stage that sets its attribute and saves it back with save_registry
+def update_registry(registry_dir, asns):
+    registry = load_registry(registry_dir) if os.path.isdir(registry_dir) else new_registry([])
+    return add_asns(registry, asns)
+
+
+# Raises a clear error when a registry was built without an attribute a stage needs
+def require_attribute(registry, name, registry_dir):
+    if name not in registry:
+        raise ValueError(f"registry {registry_dir} has no {name} attribute; build or update it with that attribute's source")
+
+
+if __name__ == "__main__":
+    registry = build_registry('../caida/20250501.as-rel2.txt.bz2',
+                              intensity_json='../as2co2_mapping/output/as2co2_intensity_may_2025.json',
+                              ppdc_file='../caida/20250501.ppdc-ases.txt.bz2',
+                              as_org_file='../caida/20250501.as-org2info.txt',
+                              asdb_csv='../asdb/2024-01_categorized_ases.csv')
+    save_registry(registry, '20250501')
+    print(f"Registered {len(registry['asns'])} ASes")
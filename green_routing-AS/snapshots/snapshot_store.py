@@ -0,0 +1,153 @@
+import csv
+import json
+import os
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Append-only store of monthly snapshots, so months can be compared without loading pairs of
+# large JSON/CSV outputs by hand. Every snapshot is one zstd-compressed Parquet file named after
+# its date (YYYY-MM-DD) under a directory per kind:
+#   as_intensity/<date>.parquet   asn, intensity                     sorted by asn
+#   links/<date>.parquet          link, as1, as2, count, emissions   sorted by link
+# where link = as1 << 32 | as2 with as1 < as2 numerically. Row groups are small and carry min/max
+# statistics, so a lookup of one ASN or one link only reads the row groups that can hold it.
+
+ROW_GROUP_SIZE = 8192
+
+AS_SCHEMA = pa.schema([('asn', pa.uint32()), ('intensity', pa.float64())])
+LINK_SCHEMA = pa.schema([('link', pa.uint64()), ('as1', pa.uint32()), ('as2', pa.uint32()),
+                         ('count', pa.int64()), ('emissions', pa.float64())])
+
+
+# Path of the snapshot of a kind ('as_intensity' or 'links') at a date
+def snapshot_path(store_dir, kind, date):
+    return os.path.join(store_dir, kind, f"{date}.parquet")
+
+
+# Dates of the snapshots of a kind, oldest first
+def list_snapshots(store_dir, kind):
+    kind_dir = os.path.join(store_dir, kind)
+    if not os.path.isdir(kind_dir):
+        return list()
+    return sorted(name[:-len('.parquet')] for name in os.listdir(kind_dir) if name.endswith('.parquet'))
+
+
+# Writes a snapshot; existing snapshots are never overwritten
+def _write_snapshot(store_dir, kind, date, table):
+    path = snapshot_path(store_dir, kind, date)
+    if os.path.exists(path):
+        raise FileExistsError(f"{kind} snapshot {date} already exists in {store_dir}")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    pq.write_table(table, path + '.tmp', compression='zstd', row_group_size=ROW_GROUP_SIZE,
+                   write_statistics=True)
+    os.replace(path + '.tmp', path)
+
+
+# Adds the per-AS intensities of a date ({asn: intensity}, like as2co2_intensity_*.json)
+def add_as_intensity_snapshot(store_dir, date, as_co2_intensity):
+    asns = np.array([int(asn) for asn in as_co2_intensity], dtype=np.uint32)
+    intensity = np.array([np.nan if v is None else v for v in as_co2_intensity.values()], dtype=np.float64)
+    order = np.argsort(asns, kind='stable')
+    _write_snapshot(store_dir, 'as_intensity', date,
+                    pa.table([asns[order], intensity[order]], schema=AS_SCHEMA))
+
+
+# Adds the links of a date; emissions may be None when only the counts are known
+def add_link_snapshot(store_dir, date, as1, as2, count, emissions=None):
+    as1 = np.asarray(as1, dtype=np.uint64)
+    as2 = np.asarray(as2, dtype=np.uint64)
+    low, high = np.minimum(as1, as2), np.maximum(as1, as2)
+    link = (low << np.uint64(32)) | high
+    order = np.argsort(link, kind='stable')
+    if emissions is None:
+        emissions = np.full(len(link), np.nan)
+    columns = [link[order], low[order].astype(np.uint32), high[order].astype(np.uint32),
+               np.asarray(count, dtype=np.int64)[order], np.asarray(emissions, dtype=np.float64)[order]]
+    _write_snapshot(store_dir, 'links', date, pa.table(columns, schema=LINK_SCHEMA))
+
+
+# Reads the as1,as2,count CSV written by countlinks.py, or a link emissions CSV with AS1,AS2 and
+# Total_CO2 (and optionally Count) columns. Returns (as1, as2, count, emissions) arrays.
+def read_links_csv(filename):
+    as1, as2, count, emissions = list(), list(), list(), list()
+    with open(filename, 'r', newline='') as f:
+        for row in csv.DictReader(f):
+            row = {key.lower(): value for key, value in row.items()}
+            as1.append(int(row['as1']))
+            as2.append(int(row['as2']))
+            count.append(int(row['count']) if row.get('count') not in (None, '') else 0)
+            emissions.append(float(row['total_co2']) if row.get('total_co2') not in (None, '') else np.nan)
+    return np.array(as1), np.array(as2), np.array(count), np.array(emissions)
+
+
+# Reads columns of the rows of one snapshot matching a filter, using the row group statistics
+def _lookup(store_dir, kind, date, columns, filters):
+    return pq.read_table(snapshot_path(store_dir, kind, date), columns=columns, filters=filters)
+
+
+# History of an ASN: [(date, intensity)] over every snapshot that has it
+def as_history(store_dir, asn):
+    history = list()
+    for date in list_snapshots(store_dir, 'as_intensity'):
+        table = _lookup(store_dir, 'as_intensity', date, ['intensity'], [('asn', '=', int(asn))])
+        if table.num_rows:
+            history.append((date, table.column('intensity')[0].as_py()))
+    return history
+
+
+# History of a link: [(date, count, emissions)] over every snapshot that has it
+def link_history(store_dir, as1, as2):
+    key = (min(int(as1), int(as2)) << 32) | max(int(as1), int(as2))
+    history = list()
+    for date in list_snapshots(store_dir, 'links'):
+        table = _lookup(store_dir, 'links', date, ['count', 'emissions'], [('link', '=', key)])
+        if table.num_rows:
+            history.append((date, table.column('count')[0].as_py(), table.column('emissions')[0].as_py()))
+    return history
+
+
+# Reads whole columns of a snapshot as numpy arrays
+def _columns(store_dir, kind, date, columns):
+    table = pq.read_table(snapshot_path(store_dir, kind, date), columns=columns)
+    return [table.column(name).to_numpy() for name in columns]
+
+
+# ASes whose intensity changed most between two dates: [(asn, before, after, change)], largest
+# absolute change first. Only the asn and intensity columns are read.
+def top_movers(store_dir, date_before, date_after, n=20):
+    asns_before, before = _columns(store_dir, 'as_intensity', date_before, ['asn', 'intensity'])
+    asns_after, after = _columns(store_dir, 'as_intensity', date_after, ['asn', 'intensity'])
+    asns, i, j = np.intersect1d(asns_before, asns_after, assume_unique=True, return_indices=True)
+    change = after[j] - before[i]
+    valid = ~np.isnan(change)
+    asns, before, after, change = asns[valid], before[i][valid], after[j][valid], change[valid]
+    top = np.argsort(-np.abs(change), kind='stable')[:n]
+    return [(int(asns[k]), float(before[k]), float(after[k]), float(change[k])) for k in top]
+
+
+# Links present at date_after but not at date_before, and the other way round.
+# Returns {'appeared': [(as1, as2)], 'disappeared': [(as1, as2)]}; only the link keys are read.
+def link_changes(store_dir, date_before, date_after):
+    links_before, = _columns(store_dir, 'links', date_before, ['link'])
+    links_after, = _columns(store_dir, 'links', date_after, ['link'])
+
+    def pairs(keys):
+        return list(zip((keys >> np.uint64(32)).tolist(), (keys & np.uint64(0xFFFFFFFF)).tolist()))
+
+    return {'appeared': pairs(np.setdiff1d(links_after, links_before, assume_unique=True)),
+            'disappeared': pairs(np.setdiff1d(links_before, links_after, assume_unique=True))}
+
+
+if __name__ == '__main__':
+    store_dir = 'store'
+
+    # Append the May 2025 outputs
+    with open('../as2co2_mapping/output/as2co2_intensity_may_2025.json', 'r') as f:
+        add_as_intensity_snapshot(store_dir, '2025-05-01', json.load(f))
+    add_link_snapshot(store_dir, '2025-05-01', *read_links_csv('../../BGPCarbonAware/as_link_emissions_may_2025.csv'))
+
+    print(as_history(store_dir, 3356))
+    snapshots = list_snapshots(store_dir, 'as_intensity')
+    if len(snapshots) > 1:
+        print(top_movers(store_dir, snapshots[-2], snapshots[-1]))